@@ -0,0 +1,73 @@
+# Copyright © Garima Kapila
+
+import os, pandas as pd, random, sys, time
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from DataCollector.Aligner import *
+from DataCollector.FastaStore import fasta_store
+from DataCollector.GlobalAlignment import blast_hsps
+
+
+"""
+Fidelity and speed of banded global alignments (around the BLAST HSP of each
+pair) compared with full global alignments, for a random sample of orthologs
+Fidelity is how many pairs get the same score and the same alignment, and how
+much score is lost when they do not
+ex. python Benchmarks/BandedAlignment.py Orthologs_Homo-Sapiens_Mus-Musculus.csv
+	Homo-Sapiens.fasta Mus-Musculus.fasta 200 32
+"""
+
+def main():
+	orthologs_file, fasta_file1, fasta_file2 = sys.argv[1:4]
+	sample_size = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+	band_width = int(sys.argv[5]) if len(sys.argv) > 5 else 32
+
+	fasta1, fasta2 = fasta_store(fasta_file1), fasta_store(fasta_file2)
+	orthologs = pd.read_csv(orthologs_file, sep = ',')
+	pairs = zip(orthologs.A, orthologs.B, blast_hsps(orthologs))
+	pairs = [pair for pair in pairs if pair[2] != None]
+	sample = random.Random(0).sample(pairs, min(sample_size, len(pairs)))
+
+	full_time, banded_time = 0, 0
+	same_score, same_alignment, widened, score_loss = 0, 0, 0, []
+	for A, B, hsp in sample:
+		seq1, seq2 = fasta1[A], fasta2[B]
+
+		start = time.time()
+		full = best_global_alignment(seq1, seq2)
+		full_time += time.time() - start
+
+		band = hsp_band(hsp, len(seq1), len(seq2), band_width)
+		start = time.time()
+		banded = best_global_alignment(seq1, seq2, band = band)
+		banded_time += time.time() - start
+
+		same_score += banded[2] == full[2]
+		same_alignment += banded[:2] == full[:2]
+		widened += banded_was_widened(seq1, seq2, band)
+		score_loss.append(full[2] - banded[2])
+
+	total = max(len(sample), 1)
+	print 'Pairs\t\t\t%d (band width %d)' % (len(sample), band_width)
+	print 'Same score\t\t%.1f%%' % (100 * float(same_score) / total)
+	print 'Same alignment\t\t%.1f%%' % (100 * float(same_alignment) / total)
+	print 'Band widened\t\t%.1f%%' % (100 * float(widened) / total)
+	print 'Score lost\t\tmean %.2f, max %.1f' %                               \
+		(sum(score_loss) / total, max(score_loss + [0]))
+	print 'Seconds\t\t\tfull %.2f, banded %.2f, %.1fx faster' %               \
+		(full_time, banded_time, full_time / max(banded_time, 1e-9))
+
+
+# whether the first band was too narrow for the best alignment
+def banded_was_widened(seq1, seq2, band):
+	if band == None:
+		return False
+	aligner = Aligner(seq1, seq2, ResidueSet(), mat.blosum62, -10, -0.5)
+	alignment1, alignment2, key = aligner.full(band)
+	return on_band_edge(alignment1, alignment2, band, len(seq1), len(seq2))
+
+
+if __name__ == "__main__":
+	main()
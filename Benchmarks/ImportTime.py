@@ -0,0 +1,52 @@
+# Copyright © Garima Kapila
+
+import os, subprocess, sys, time
+
+
+"""
+Cold-start import time of the modules each stage of run.py needs
+Every measurement starts a new interpreter, the time of an interpreter that
+imports nothing is subtracted
+ex. python Benchmarks/ImportTime.py 5
+"""
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+stages = [
+	['nothing', 'pass'],
+	['run.py', 'import run'],
+	['--stage collect', 'import run, Collector'],
+	['--stage results', 'import run, Results'],
+	# what 'import run' cost before, results and graphing imported eagerly
+	['eager imports', 'import run, Collector, Results, ML.Visualizer as v; '
+		'v.load_graphing()'],
+]
+
+
+def main():
+	repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+	# compile modules first so import time does not include compiling
+	subprocess.check_call([sys.executable, '-m', 'compileall', '-q',
+		repository])
+
+	times = [[name, median_time(code, repeats)] for name, code in stages]
+	interpreter = times[0][1]
+	eager = times[-1][1] - interpreter
+	print 'Stage\t\t\tSeconds\t\tEager/Stage'
+	for name, seconds in times[1:]:
+		seconds -= interpreter
+		print '%-16s\t%.3f\t\t%.1fx' % (name, seconds, eager / seconds)
+
+
+# median wall time of importing code in a new interpreter
+def median_time(code, repeats):
+	times = []
+	for i in range(repeats):
+		start = time.time()
+		subprocess.check_call([sys.executable, '-c', code], cwd = repository)
+		times.append(time.time() - start)
+	return sorted(times)[len(times) / 2]
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,159 @@
+# Copyright © Garima Kapila
+
+from Organism import Organism
+import json, os, re, sys, threading, time
+
+
+"""
+Snapshot of the organisms, epithets, interface options and taxon IDs that
+interactions can be transferred between, stored in catalog.json
+Loading the snapshot takes milliseconds, scraping the INSIDER and HINT
+databases again only happens on refresh (ex. 'python run.py refresh')
+ex. usage:
+catalog = Catalog()
+organisms = catalog.organisms()
+"""
+class Catalog():
+
+	def __init__(self, file='catalog.json'):
+		self.file = file
+		self.snapshot = {}
+		if os.path.exists(file):
+			with open(file, 'r') as f:
+				self.snapshot = json.load(f)
+
+	# dictionary of acronym (ex. 'HS'): Organism
+	def organisms(self):
+		organisms = [
+			Organism(str(organism['genus']), str(organism['epithet']),
+				str(organism['strain']), organism['taxon_ID'])
+			for organism in self.snapshot.get('organisms', [])
+		]
+		return {organism.acronym: organism for organism in organisms}
+
+	# interface options from INSIDER database (ex. 'ALL', 'HQ')
+	def interface_options(self):
+		return [str(option) for option in
+			self.snapshot.get('interface_options', [])]
+
+	def epithets(self):
+		return [str(epithet) for epithet in self.snapshot.get('epithets', [])]
+
+	def exists(self):
+		return self.snapshot != {}
+
+	# snapshot is older than max_age seconds
+	def is_stale(self, max_age):
+		return time.time() - self.snapshot.get('updated', 0) > max_age
+
+
+
+	# scrape databases again and write new snapshot, cache is DownloadCache
+	def refresh(self, cache):
+		interface_options, epithets = get_INSIDER_options(cache)
+		organisms = get_HINT_options(epithets, cache)
+		known_IDs = dict(
+			((organism.genus, organism.epithet, organism.strain),
+				organism.taxon_ID)
+			for organism in self.organisms().values()
+		)
+		snapshot = {
+			'updated': time.time(),
+			'interface_options': sorted(interface_options),
+			'epithets': sorted(epithets),
+			'organisms': [
+				{
+					'genus': organism.genus,
+					'epithet': organism.epithet,
+					'strain': organism.strain,
+					'taxon_ID': known_IDs.get(organism.params) or
+						get_taxon_ID(organism, cache)
+				}
+				for organism in organisms
+			]
+		}
+		# write to temporary file first so a reader never sees half a file
+		temp_file = self.file + '.tmp'
+		with open(temp_file, 'w') as f:
+			json.dump(snapshot, f, indent = 1, sort_keys = True)
+		os.rename(temp_file, self.file)
+		self.snapshot = snapshot
+		return self
+
+	# refresh while the program continues with the current snapshot
+	def refresh_in_background(self, cache):
+		def refresh():
+			try:
+				self.refresh(cache)
+			except Exception as error:
+				message = '\n> Could not refresh %s: %s' % (self.file, error)
+				sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
+		thread = threading.Thread(target = refresh)
+		# a refresh left running does not keep the program from exiting
+		thread.daemon = True
+		thread.start()
+		return thread
+
+
+
+##################
+# Helper Methods #
+##################
+
+
+# get organisms and interface options from INSIDER database
+def get_INSIDER_options(cache):
+	import bs4, lxml.html as html
+	url = 'http://interactomeinsider.yulab.org/downloads.html'
+	with cache.open(url, fresh = True) as page:
+		soup = str(bs4.BeautifulSoup(page, 'html.parser'))
+	tree = html.fromstring(soup)
+	# gather organism names from download links
+	hrefs = tree.xpath('//td//a/@href')
+	interface_options = {}
+	epithets = {}
+	for href in hrefs:
+		file_name = href.split('/')[-1].replace('.txt', '').split('_')
+		epithet = file_name[1]
+		interface_option = ''.join([c for c in file_name[-1] if c.isupper()])
+		epithets[epithet] = 1
+		interface_options[interface_option] = 1
+	return interface_options, epithets
+
+
+# get organisms from HINT database
+def get_HINT_options(epithets, cache):
+	import bs4, lxml.html as html
+	url = 'http://hint.yulab.org/download/'
+	with cache.open(url, fresh = True) as page:
+		soup = str(bs4.BeautifulSoup(page, 'html.parser'))
+	tree = html.fromstring(soup)
+	# gather organism names from download links
+	hrefs = tree.xpath('//div[@class="am-u-sm-6"]//a//@href')
+	hrefs = [href for href in hrefs if 'binary/hq' in href]
+	# filter organisms that have predicted interface residues from INSIDER
+	hrefs = [href for href in hrefs                                           \
+		if any(word.lower() in href.lower() for word in epithets.keys())]
+	# convert to Organism objects
+	hrefs = [href.replace('/download/', '') for href in hrefs]
+	hrefs = [href.replace('binary/hq', '') for href in hrefs]
+	names = [href.replace('/', '') for href in hrefs]
+	names = [tuple(re.findall('[A-Z][^A-Z]*', name)) for name in names]
+	genus = [name[0] for name in names]
+	names = [[name[1], ''.join(name[2:])] for name in names]
+	epithet = [re.sub(r'[0-9]+', '', name[0]) for name in names]
+	strain = [''.join([re.sub(r'[A-Z][a-z]+', '', name[0]), name[1]])
+		for name in names]
+	organisms = [Organism(g, e, s) for g, e, s in zip(genus, epithet, strain)]
+	return organisms
+
+
+# look up taxon ID of organism in UniProt taxonomy, None if not found
+def get_taxon_ID(organism, cache):
+	url = 'http://www.uniprot.org/taxonomy/?query=%22{}%20{}%22&format=tab'   \
+		'&columns=id&limit=1'.format(organism.genus, organism.epithet.lower())
+	with cache.open(url, fresh = True) as page:
+		rows = page.read().splitlines()
+	if len(rows) > 1 and rows[1].split('\t')[0].isdigit():
+		return int(rows[1].split('\t')[0])
+	return None
@@ -1,7 +1,9 @@
 # Copyright © Garima Kapila
 
+from DataCollector.AlignmentCache import AlignmentCache
 from DataCollector.BlastP import *
 from DataCollector.DataParser import *
+from DataCollector.DownloadCache import DownloadCache
 from DataCollector.FileFetcher import FileFetcher
 from DataCollector.GlobalAlignment import *
 from DataCollector.Interologs import *
@@ -12,12 +14,33 @@ import shutil
 
 class Collector():
 
-	# input organism is of type Organism
-	def __init__(self, organism1, organism2, option):
+	# input organism is of type Organism, cache is of type DownloadCache
+	# jobs = number of processes for global alignments and interface residues
+	# alignment = 'best', 'banded' or 'all', see global_alignment
+	# alignment_cache is of type AlignmentCache, kept next to download cache
+	# align_all = align every ortholog, not only ones that can form interologs
+	# blast_workers = blastp processes on shards of proteins, blast_threads
+	# = threads of each blastp process
+	def __init__(self, organism1, organism2, option, cache=None, jobs=1,
+		alignment='best', band_width=32, alignment_cache=None,
+		align_all=False, blast_workers=1, blast_threads=1):
 		self.organism1 = organism1
 		self.organism2 = organism2
 		self.names = organism1.name + '_' + organism2.name
 		self.option = option.upper()
+		if cache == None:
+			cache = DownloadCache()
+		self.cache = cache
+		if alignment_cache == None:
+			alignment_cache = AlignmentCache(os.path.join(cache.directory,
+				'alignments.sqlite'))
+		self.alignment_cache = alignment_cache
+		self.jobs = jobs
+		self.alignment = alignment
+		self.band_width = band_width
+		self.align_all = align_all
+		self.blast_workers = blast_workers
+		self.blast_threads = blast_threads
 		
 		# Put all results files in directory with prefix 'Data'
 		self.directory = self.option + '/Data/'
@@ -36,34 +59,41 @@ class Collector():
 	def run(self, update=False):
 		
 		# 1. fetch fasta, interactome, and interfaces files
-		fasta1, interactome1, interfaces, sites, pfam =                       \
-			self.fetch_files1(self.organism1)
-		fasta2, interactome2 = self.fetch_files2(self.organism2)
+		fasta1, interactome1, interfaces, sites, fasta2, interactome2 =       \
+			self.fetch_files()
 		
-		# 2. filter
+		# 2. filter, domains are only kept for filtered proteins
 		self.filter_relevant_proteins(fasta1, interactome1, interfaces)
 		self.filter_fasta(fasta2)
+		pfam = FileFetcher(self.organism1, self.cache).fetch_pfam(
+			fasta_file = fasta1)
 		
 		# 3. run blast between both organisms
 		blast = self.locate_file('BlastP', reverse = True)
 		if blast == None and not update:
-			blast = run_blastp(fasta1, fasta2)
+			blast = run_blastp(fasta1, fasta2, workers = self.blast_workers,
+				threads = self.blast_threads)
 		elif not update:
 			blast = self.copy_reverse_blast_file(blast)
 			print 'Using existing blast file'
 		
 		if not update:
-		# 4. filter blast for orthologs
-			orthologs = get_orthologs(blast, fasta1, fasta2)
+		# 4. filter blast for orthologs, by default only ones that can form
+		# interologs with interface residues are aligned and labeled
+			if self.align_all:
+				orthologs = get_orthologs(blast, fasta1, fasta2)
+			else:
+				orthologs = get_orthologs(blast, fasta1, fasta2,
+					interactome_file1 = interactome1,
+					interfaces_file1 = interfaces)
 			
 		# 5. get global alignments between orthologs
 			global_alignments = get_global_alignments(orthologs, fasta1,
-				fasta2, interfaces)
+				fasta2, interfaces, jobs = self.jobs, mode = self.alignment,
+				band_width = self.band_width, cache = self.alignment_cache)
 			
 		# 6. label orthologs
-			label_orthologs_global_alignments(global_alignments, orthologs)
-			label_orthologs_special_sites(sites, orthologs, global_alignments)
-			label_orthologs_pfam(pfam, orthologs, global_alignments)
+			label_orthologs(orthologs, global_alignments, sites, pfam)
 		
 		else:
 			orthologs = self.locate_file('Orthologs')
@@ -74,7 +104,7 @@ class Collector():
 		
 		# 8. add interface residue infomration
 		interologs = add_interface_information(interologs, interfaces,
-			global_alignments, sites, pfam, fasta1)
+			global_alignments, sites, pfam, fasta1, jobs = self.jobs)
 		
 		# 9. delete/move certain files and return path to interologs file
 		self.clean()
@@ -85,12 +115,12 @@ class Collector():
 	# Helper methods #
 	##################
 
-	# delete fetched files and move data files into data subdirectory and
-	# return interologs file
+	# delete fetched files (copies remain in download cache) and move data
+	# files into data subdirectory and return interologs file
 	def clean(self):
 		delete_keywords = ['.fasta', '-Interactome', '-Interfaces', 'Pfam',
 			'Special-Sites']
-		move_keywords = ['.csv']
+		move_keywords = ['.csv', '.aln']
 		for file in os.listdir('.'):
 			if any(word in file for word in delete_keywords):
 				os.remove(file)
@@ -117,8 +147,8 @@ class Collector():
 		blast = blast.rename(index = str, columns = renamed_cols)
 
 		# filter blast proteins that are in fasta file
-		fasta1 = fasta_as_dict(self.organism1.name + '.fasta')
-		fasta2 = fasta_as_dict(self.organism2.name + '.fasta')
+		fasta1 = fasta_store(self.organism1.name + '.fasta')
+		fasta2 = fasta_store(self.organism2.name + '.fasta')
 		blast = blast.loc[blast['A'].isin(fasta1.keys())]
 		blast = blast.loc[blast['B'].isin(fasta2.keys())]
 
@@ -138,23 +168,25 @@ class Collector():
 				return dirpath + '/' + file_name
 		return None
 
-	# organism to transfer from, option is 'ALL' or 'HQ' (INSIDER database)
-	def fetch_files1(self, organism):
-		ff = FileFetcher(organism)
-		fasta_file = ff.fetch_fasta()
-		interactome_file = ff.fetch_interactome()
-		interfaces_file = ff.fetch_interfaces(option = self.option)
-		special_sites_file = ff.fetch_special_sites()
-		pfam_file = ff.fetch_pfam()
-		return [fasta_file, interactome_file, interfaces_file,
-			special_sites_file, pfam_file]
-
-	# organism to transfer to
-	def fetch_files2(self, organism):
-		ff = FileFetcher(organism)
-		fasta_file = ff.fetch_fasta()
-		interactome_file = ff.fetch_interactome()
-		return [fasta_file, interactome_file]
+	"""
+	fetch files for organism to transfer from (option is 'ALL' or 'HQ' for
+	INSIDER database) and organism to transfer to, all files are downloaded
+	in parallel, Pfam archive is only downloaded into the cache
+	"""
+	def fetch_files(self):
+		ff1 = FileFetcher(self.organism1, self.cache)
+		ff2 = FileFetcher(self.organism2, self.cache)
+		fetches = [
+			ff1.fetch_fasta,
+			ff1.fetch_interactome,
+			lambda: ff1.fetch_interfaces(option = self.option),
+			ff1.fetch_special_sites,
+			ff1.download_pfam,
+			ff2.fetch_fasta,
+			ff2.fetch_interactome
+		]
+		files = self.cache.downloader.run(fetches)
+		return files[:4] + files[5:]
 
 	# filter proteins in fasta that are in interactome_file and interfaces_file
 	def filter_relevant_proteins(self, fasta_file, interactome_file,
@@ -179,26 +211,26 @@ class Collector():
 	"""
 	def filter_fasta(self, fasta_file, prot_dict={}, out_file='', 
 		has_ambiguous=False):
-		# return fasta file as dictionary of (protein, sequence) pairs
-		fasta = fasta_as_dict(fasta_file)
+		fasta = fasta_store(fasta_file)
 		# filter proteins in fasta file that are also in prot_dict
 		if prot_dict != {}:
-			filtered = dict(('>' + prot, seq) for (prot, seq) in
-				fasta.iteritems() if prot in prot_dict)
+			filtered = [prot for prot in fasta if prot in prot_dict]
 		else:
-			filtered = dict(('>' + prot, seq) for (prot, seq) in
-				fasta.iteritems() if prot in fasta)
+			filtered = fasta.keys()
 		# default is to write into fasta file
 		if out_file == '':
 			out_file = fasta_file
-		# write filtered fasta in out_file
+		# write filtered fasta in temporary file, fasta_file is still being read
 		ambiguous = 'BUXZ'
-		with open(out_file, 'w') as f:
-			for prot, seq in filtered.iteritems():
+		temp_file = out_file + '.tmp'
+		with open(temp_file, 'w') as f:
+			for prot in filtered:
+				seq = fasta[prot]
 				# check if sequences with residue 'U' should be kept
 				if has_ambiguous or \
 				not has_ambiguous and not any((r in seq) for r in ambiguous):
-					f.write(prot + '\n' + seq + '\n')
+					f.write('>' + prot + '\n' + seq + '\n')
+		os.rename(temp_file, out_file)
 		# return number of filtered proteins
 		return len(filtered)
 
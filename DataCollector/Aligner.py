@@ -0,0 +1,425 @@
+# Copyright © Garima Kapila
+
+import Bio.SubsMat.MatrixInfo as mat, numpy as np
+from ResidueSet import ResidueSet
+
+
+"""
+Global alignment with affine gaps (Gotoh) that returns a single alignment:
+of the alignments with the best score, the one with the most identical
+residues, then the most identical interface residues, which is the same rule
+GlobalAlignment uses to pick from every optimal alignment of Bio.pairwise2,
+but without listing the optimal alignments
+Score (doubled so half points are integers), identical and interface
+identical counts are added in one int64 key per cell:
+key = 2 * score * SCORE + identical * IDENTICAL + interface identical
+so the largest key is the best alignment with ties already broken
+Scores are the same as Bio.pairwise2.align.globalds, end gaps are penalized
+and the first residue of a gap costs gap_open, each next one gap_extend
+Pairs with a traceback matrix over linear_space_cells cells or memory_budget
+bytes (ex. titin) are aligned in linear space (Myers-Miller, Hirschberg for
+affine gaps) to the same best score and counts, only ties between equally
+good alignments can be broken differently
+ex. usage:
+best_global_alignment('MKTAYIAK', 'MKTYIAKQ', ResidueSet.parse('[2-4]'))
+returns ('MKTAYIAK-', 'MKT-YIAKQ', 15.0, 9)
+"""
+
+# weights of score, identical count and interface identical count in a key,
+# counts are less than 2^16 (length of protein)
+SCORE = 1 << 32
+IDENTICAL = 1 << 16
+
+# key of cells that cannot be reached
+UNREACHABLE = -(1 << 60)
+
+# traceback of a cell, its best alignment ends with (first 3 bits) diagonal,
+# a gap of length 1 or a longer gap in sequence 2 or sequence 1, and whether a
+# gap in sequence 2 or sequence 1 ending at the cell can be extended
+DIAGONAL, OPEN_GAP2, OPEN_GAP1, EXTEND_GAP2, EXTEND_GAP1 = 0, 1, 2, 3, 4
+CAN_EXTEND_GAP2, CAN_EXTEND_GAP1 = 8, 16
+
+
+# pairs with more cells than this are aligned in linear space
+linear_space_cells = 1 << 26
+
+# bytes a pair may use for its traceback matrix (1 byte per cell)
+memory_budget = 1 << 28
+
+# largest block aligned with a traceback matrix in linear space
+block_cells = 1 << 20
+
+
+"""
+returns alignment1, alignment2, score and alignment length
+residue_indices = 0-based interface residues of seq1 (ResidueSet)
+max_cells, max_bytes = limits of the traceback matrix before switching to
+linear space, linear_space_cells and memory_budget by default
+band = (lowest, highest) diagonal j - i of cells to align, all if None
+"""
+def best_global_alignment(seq1, seq2, residue_indices=ResidueSet(),
+	matrix=mat.blosum62, gap_open=-10, gap_extend=-0.5, max_cells=None,
+	max_bytes=None, band=None):
+	if max_cells == None:
+		max_cells = linear_space_cells
+	if max_bytes == None:
+		max_bytes = memory_budget
+	n, m = len(seq1), len(seq2)
+	aligner = Aligner(seq1, seq2, residue_indices, matrix, gap_open,
+		gap_extend)
+	if band != None:
+		band = clip_band(band, n, m)
+
+	while True:
+		cells = (n + 1) * band_columns(band, m)
+		if cells > max_cells or cells > max_bytes:
+			alignment1, alignment2, key = aligner.linear_space(band, max_bytes)
+		else:
+			alignment1, alignment2, key = aligner.full(band)
+		# a better alignment may be outside the band
+		if band == None or not on_band_edge(alignment1, alignment2, band, n, m):
+			break
+		band = widen_band(band, n, m)
+
+	return alignment1, alignment2, score_of_key(key), len(alignment1)
+
+"""
+band of diagonals around a BLAST HSP, hsp = (start1, end1, start2, end2),
+1-based like BLAST, width = diagonals added on each side, None if no hsp
+"""
+def hsp_band(hsp, n, m, width):
+	if hsp == None:
+		return None
+	start1, end1, start2, end2 = hsp
+	diagonals = [start2 - start1, end2 - end1]
+	return clip_band((min(diagonals) - width, max(diagonals) + width), n, m)
+
+
+
+"""
+Sequences of one pair encoded for alignment, aligns all of them (full) or
+parts of them (block, split) between rows i1, i2 of seq1 and columns j1, j2
+of seq2, band = diagonals of the whole pair
+top_open, bottom_open = cost of the first residue of a gap in seq2 that
+starts at the top left or ends at the bottom right of a part, gap_extend
+instead of gap_open if the gap goes on in the part above or below
+"""
+class Aligner():
+
+	def __init__(self, seq1, seq2, residue_indices, matrix, gap_open,
+		gap_extend):
+		self.seq1, self.seq2 = seq1, seq2
+		self.go, self.ge = gap_key(gap_open), gap_key(gap_extend)
+		self.profile, self.codes1, self.codes2 = substitution_profile(seq1,
+			seq2, matrix)
+		self.interface = interface_mask(residue_indices, len(seq1))
+
+
+
+	# alignments and key with a traceback matrix of the whole pair
+	def full(self, band=None):
+		return self.block(0, len(self.seq1), 0, len(self.seq2), self.go,
+			self.go, band)
+
+	# alignments and key keeping only a few rows of keys and small blocks
+	def linear_space(self, band=None, max_bytes=memory_budget):
+		aligned1, aligned2 = [], []
+		key = self.split(0, len(self.seq1), 0, len(self.seq2), self.go,
+			self.go, band, aligned1, aligned2, min(block_cells, max_bytes))
+		return ''.join(aligned1), ''.join(aligned2), key
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	"""
+	part of the pair with a traceback matrix, returns alignments and key
+	traceback rows only have the columns inside the band, starting at starts
+	"""
+	def block(self, i1, i2, j1, j2, top_open, bottom_open, band):
+		part = self.part(i1, i2, j1, j2, band)
+		traceback = np.zeros((i2 - i1 + 1, band_columns(part[-1], j2 - j1)),
+			dtype = np.uint8)
+		starts = []
+		rows = alignment_rows(*part + (self.go, self.ge, top_open,
+			bottom_open))
+		for i, (start, H, gap2, keys) in enumerate(rows):
+			starts.append(start)
+			if keys == None:
+				# row 0 is a gap in seq1 before seq2
+				traceback[0, 1:len(H)] = EXTEND_GAP1 | CAN_EXTEND_GAP1
+				traceback[0, 1:2] = OPEN_GAP1
+			else:
+				traceback[i, :len(H)] = traceback_row(H, gap2, keys, self.go,
+					self.ge)
+		alignment1, alignment2 = trace_alignment(self.seq1[i1:i2],
+			self.seq2[j1:j2], traceback, starts)
+		return alignment1, alignment2, H[-1]
+
+	"""
+	Myers-Miller: best alignment crosses the middle row either at a cell or
+	inside a gap in seq2, found by adding keys of the last row of the top half
+	and of the first row of the bottom half (aligned backwards), then both
+	halves are split the same way until they are small enough for block
+	Alignments are appended to aligned1, aligned2, returns key
+	"""
+	def split(self, i1, i2, j1, j2, top_open, bottom_open, band, aligned1,
+		aligned2, max_cells):
+		n, m = i2 - i1, j2 - j1
+		cells = (n + 1) * band_columns(self.part(i1, i2, j1, j2, band)[-1], m)
+		if n <= 1 or m == 0 or cells <= max_cells:
+			alignment1, alignment2, key = self.block(i1, i2, j1, j2, top_open,
+				bottom_open, band)
+			aligned1.append(alignment1)
+			aligned2.append(alignment2)
+			return key
+
+		middle = i1 + n / 2
+		H1, gap1 = self.last_row(i1, middle, j1, j2, top_open, band, False)
+		H2, gap2 = self.last_row(middle, i2, j1, j2, bottom_open, band, True)
+		at_cell = H1 + H2[::-1]
+		# a gap through the middle row is opened only once
+		in_gap = gap1 + gap2[::-1] - self.go + self.ge
+		j, k = at_cell.argmax(), in_gap.argmax()
+
+		if at_cell[j] >= in_gap[k]:
+			self.split(i1, middle, j1, j1 + j, top_open, self.go, band,
+				aligned1, aligned2, max_cells)
+			self.split(middle, i2, j1 + j, j2, self.go, bottom_open, band,
+				aligned1, aligned2, max_cells)
+			return at_cell[j]
+
+		# residues on both sides of the middle row are in the gap
+		self.split(i1, middle - 1, j1, j1 + k, top_open, self.ge, band,
+			aligned1, aligned2, max_cells)
+		aligned1.append(self.seq1[middle - 1:middle + 1])
+		aligned2.append('--')
+		self.split(middle + 1, i2, j1 + k, j2, self.ge, bottom_open, band,
+			aligned1, aligned2, max_cells)
+		return in_gap[k]
+
+	"""
+	keys of last row (best, ends with a gap in seq2) of part of the pair,
+	backwards from bottom right if reverse, cells outside band are unreachable
+	"""
+	def last_row(self, i1, i2, j1, j2, top_open, band, reverse):
+		codes1, codes2, profile, interface, band = self.part(i1, i2, j1, j2,
+			band)
+		n, m = i2 - i1, j2 - j1
+		if reverse:
+			codes1, codes2, profile, interface = codes1[::-1], codes2[::-1],  \
+				profile[:, ::-1], interface[::-1]
+			if band != None:
+				band = (m - n - band[1], m - n - band[0])
+		for start, H, gap2, keys in alignment_rows(codes1, codes2, profile,
+			interface, band, self.go, self.ge, top_open, self.go):
+			pass
+		row = np.full(m + 1, UNREACHABLE, dtype = np.int64)
+		gaps = np.full(m + 1, UNREACHABLE, dtype = np.int64)
+		row[start:start + len(H)] = H
+		gaps[start:start + len(H)] = gap2
+		return row, gaps
+
+	"""
+	codes, substitution keys and interface residues of part of the pair, and
+	band as diagonals of the part
+	"""
+	def part(self, i1, i2, j1, j2, band):
+		if band != None:
+			band = (band[0] - j1 + i1, band[1] - j1 + i1)
+		return self.codes1[i1:i2], self.codes2[j1:j2],                        \
+			self.profile[:, j1:j2], self.interface[i1:i2], band
+
+
+
+"""
+keys of each row (residue of seq1) of the alignment matrix, only for columns
+inside band, yields first column, best key of each cell (H), key of ending
+with a gap in seq2 and keys needed for traceback (None for row 0)
+Gaps in seq1 within a row are found with a running maximum instead of one
+cell at a time, opening a gap after k cells of the row costs
+H0[k] + gap_open + (j - k - 1) * gap_extend for cell j
+"""
+def alignment_rows(codes1, codes2, profile, interface, band, go, ge, top_open,
+	bottom_open):
+	n, m = len(codes1), len(codes2)
+	lowest, highest = band if band != None else (-n, m)
+	steps = np.arange(m + 1, dtype = np.int64) * ge
+
+	# previous row, cells right of the band stay unreachable
+	H = np.full(m + 1, UNREACHABLE, dtype = np.int64)
+	gap2 = np.full(m + 1, UNREACHABLE, dtype = np.int64)
+
+	# row 0 is a gap in seq1 before seq2
+	end = min(m, highest)
+	H[0] = 0
+	H[1:end + 1] = go + steps[:end]
+	yield 0, H[:end + 1], gap2[:end + 1], None
+
+	for i in range(1, n + 1):
+		start, end = max(0, i + lowest), min(m, i + highest)
+		columns = end - start + 1
+
+		# gap in seq2, from cell above
+		opened = H[start:end + 1] + go
+		extended = gap2[start:end + 1] + ge
+		if i == 1 and start == 0:
+			opened[0] = H[0] + top_open
+		if i == n and end == m:
+			opened[-1] += bottom_open - go
+			extended[-1] += bottom_open - go
+		gaps2 = np.maximum(opened, extended)
+
+		# residue of seq1 aligned to residue of seq2, from cell diagonal
+		first = max(start, 1)
+		row = profile[codes1[i - 1], first - 1:end]
+		if interface[i - 1]:
+			row = row + (codes2[first - 1:end] == codes1[i - 1])
+		diagonal = np.full(columns, UNREACHABLE, dtype = np.int64)
+		diagonal[first - start:] = H[first - 1:end] + row
+		H0 = np.maximum(diagonal, gaps2)
+
+		# gap in seq1, from cell on the left
+		best_open = np.maximum.accumulate(H0 - steps[:columns])
+		gaps1 = np.full(columns, UNREACHABLE, dtype = np.int64)
+		gaps1[1:] = go + steps[:columns - 1] + best_open[:-1]
+		best = np.maximum(H0, gaps1)
+
+		H[start:end + 1] = best
+		gap2[start:end + 1] = gaps2
+		yield start, best, gaps2, (diagonal, opened, extended, H0, gaps1)
+
+# traceback of a row from its keys
+def traceback_row(H, gap2, keys, go, ge):
+	diagonal, opened, extended, H0, gap1 = keys
+	can_open_gap2 = opened == gap2
+	can_extend_gap2 = extended == gap2
+	can_open_gap1 = np.zeros(len(H), dtype = bool)
+	can_open_gap1[1:] = H0[:-1] + go == gap1[1:]
+	can_extend_gap1 = np.zeros(len(H), dtype = bool)
+	can_extend_gap1[1:] = gap1[:-1] + ge == gap1[1:]
+
+	# for equal keys prefer the same alignment Bio.pairwise2 finds first
+	source = np.select([
+		(gap1 == H) & can_open_gap1,
+		diagonal == H,
+		(gap2 == H) & can_open_gap2,
+		gap1 == H
+	], [OPEN_GAP1, DIAGONAL, OPEN_GAP2, EXTEND_GAP1], EXTEND_GAP2)
+	return source | (can_extend_gap2 * CAN_EXTEND_GAP2) |                     \
+		(can_extend_gap1 * CAN_EXTEND_GAP1)
+
+"""
+follow traceback from last cell back to first cell, inside a gap (state) the
+gap is extended as long as possible
+starts = first column of each traceback row
+"""
+def trace_alignment(seq1, seq2, traceback, starts):
+	i, j = len(seq1), len(seq2)
+	aligned1, aligned2 = [], []
+	state = DIAGONAL
+	while i > 0 or j > 0:
+		bits = traceback.item(i, j - starts[i])
+		if state == DIAGONAL:
+			source = bits & 7
+			if source == DIAGONAL:
+				aligned1.append(seq1[i - 1])
+				aligned2.append(seq2[j - 1])
+				i, j = i - 1, j - 1
+			elif source == OPEN_GAP2:
+				aligned1.append(seq1[i - 1])
+				aligned2.append('-')
+				i -= 1
+			elif source == OPEN_GAP1:
+				aligned1.append('-')
+				aligned2.append(seq2[j - 1])
+				j -= 1
+			else:
+				state = source
+		elif state == EXTEND_GAP2:
+			aligned1.append(seq1[i - 1])
+			aligned2.append('-')
+			if not bits & CAN_EXTEND_GAP2:
+				state = DIAGONAL
+			i -= 1
+		else:
+			aligned1.append('-')
+			aligned2.append(seq2[j - 1])
+			if not bits & CAN_EXTEND_GAP1:
+				state = DIAGONAL
+			j -= 1
+	return ''.join(reversed(aligned1)), ''.join(reversed(aligned2))
+
+
+
+### Bands of diagonals ###
+
+"""
+band that contains diagonals 0 and m - n (first and last cell) so every
+band has an alignment, None if the band has every cell
+"""
+def clip_band(band, n, m):
+	lowest, highest = min(band[0], 0, m - n), max(band[1], 0, m - n)
+	if lowest <= -n and highest >= m:
+		return None
+	return max(lowest, -n), min(highest, m)
+
+# most columns of a row inside band
+def band_columns(band, m):
+	if band == None:
+		return m + 1
+	return min(m + 1, band[1] - band[0] + 1)
+
+# whether the alignment goes through a cell on the edge of the band
+def on_band_edge(alignment1, alignment2, band, n, m):
+	i = np.cumsum(np.frombuffer(alignment1, np.uint8) != ord('-'))
+	j = np.cumsum(np.frombuffer(alignment2, np.uint8) != ord('-'))
+	diagonals = j - i
+	return (band[0] > -n and (diagonals == band[0]).any()) or                 \
+		(band[1] < m and (diagonals == band[1]).any())
+
+# band with twice as many diagonals on each side
+def widen_band(band, n, m):
+	margin = max(band[1] - band[0], 1)
+	return clip_band((band[0] - margin, band[1] + margin), n, m)
+
+
+
+### Encoding ###
+
+"""
+keys of aligning each residue code with every residue of seq2, and residue
+codes of both sequences
+key = 2 * substitution score * SCORE + IDENTICAL if residues are the same
+"""
+def substitution_profile(seq1, seq2, matrix):
+	residues = sorted(set(seq1) | set(seq2))
+	code = dict((residue, k) for k, residue in enumerate(residues))
+	keys = np.zeros((len(residues), len(residues)), dtype = np.int64)
+	for residue1 in residues:
+		for residue2 in residues:
+			if (residue1, residue2) in matrix:
+				score = matrix[(residue1, residue2)]
+			else:
+				score = matrix[(residue2, residue1)]
+			keys[code[residue1], code[residue2]] = int(2 * score) * SCORE +   \
+				(residue1 == residue2) * IDENTICAL
+	codes1 = np.array([code[residue] for residue in seq1], dtype = np.intp)
+	codes2 = np.array([code[residue] for residue in seq2], dtype = np.intp)
+	return keys[:, codes2], codes1, codes2
+
+# boolean array of whether each residue of sequence is an interface residue
+def interface_mask(residue_indices, length):
+	interface = np.zeros(length, dtype = bool)
+	indices = residue_indices.indices()
+	interface[indices[(indices >= 0) & (indices < length)]] = True
+	return interface
+
+def gap_key(gap_score):
+	return int(round(2 * gap_score)) * SCORE
+
+# alignment score from key, counts are always less than SCORE
+def score_of_key(key):
+	return (int(key) // SCORE) / 2.0
@@ -0,0 +1,138 @@
+# Copyright © Garima Kapila
+
+import hashlib, os, sqlite3, time
+
+
+# number of alignments written to the database at once
+write_size = 1000
+
+# number of keys looked up with one query (sqlite allows at most 999)
+query_size = 500
+
+
+"""
+Persistent cache of global alignments shared by every transfer, so pairs of
+sequences that were aligned before (ex. HS SC ALL after HS SC HQ, or after a
+fasta file is refreshed with mostly the same sequences) are not aligned again
+Alignments are kept in an sqlite database under alignment_key of both
+sequences and the scoring and mode of the alignment; several processes can
+read and write it at once, and least recently used alignments are removed
+when it is larger than max_size bytes
+ex. usage:
+cache = AlignmentCache('Cache/alignments.sqlite', max_size=2*1024**3)
+key = alignment_key(seq1, seq2, 'blosum62 -10 -0.5 best')
+cache.get_many([key]) -> {key: (alignment1, alignment2, score, length)}
+cache.put(key, (alignment1, alignment2, score, length)); cache.save()
+"""
+class AlignmentCache():
+
+	def __init__(self, file='alignments.sqlite', max_size=2*1024**3):
+		self.file = file
+		# bytes of alignments kept before least recently used are evicted
+		self.max_size = max_size
+		directory = os.path.dirname(file)
+		if directory != '' and not os.path.exists(directory):
+			os.makedirs(directory)
+
+		# waits for other processes writing for up to timeout seconds, with
+		# write-ahead logging readers are not blocked by a writer
+		self.connection = sqlite3.connect(file, timeout = 60)
+		self.connection.text_factory = str
+		self.connection.execute('PRAGMA journal_mode = WAL')
+		self.connection.execute('PRAGMA synchronous = NORMAL')
+		self.connection.execute('CREATE TABLE IF NOT EXISTS alignments ('
+			'key TEXT PRIMARY KEY, alignment1 TEXT, alignment2 TEXT, '
+			'score REAL, length INTEGER, size INTEGER, accessed REAL)')
+		self.connection.execute('CREATE INDEX IF NOT EXISTS alignments_'
+			'accessed ON alignments (accessed)')
+		self.connection.commit()
+
+		# alignments not written to the database yet
+		self.pending = []
+		self.hits, self.misses = 0, 0
+
+
+
+	# dictionary of key: (alignment1, alignment2, score, length) of keys found
+	def get_many(self, keys):
+		found = {}
+		keys = list(keys)
+		for start in range(0, len(keys), query_size):
+			batch = keys[start:start + query_size]
+			marks = ','.join('?' * len(batch))
+			rows = self.connection.execute('SELECT key, alignment1, '
+				'alignment2, score, length FROM alignments WHERE key IN (%s)'
+				% marks, batch).fetchall()
+			for key, alignment1, alignment2, score, length in rows:
+				found[key] = (alignment1, alignment2, score, length)
+			# found alignments become most recently used
+			self.connection.execute('UPDATE alignments SET accessed = ? '
+				'WHERE key IN (%s)' % marks, [time.time()] + batch)
+		self.connection.commit()
+		self.hits += len(found)
+		self.misses += len(keys) - len(found)
+		return found
+
+	# result = (alignment1, alignment2, score, length), written in batches
+	def put(self, key, result):
+		self.pending.append((key,) + tuple(result))
+		if len(self.pending) >= write_size:
+			self.flush()
+
+	# write pending alignments and evict if the cache is too large
+	def save(self):
+		self.flush()
+		self.evict()
+
+	def close(self):
+		self.save()
+		self.connection.close()
+
+	# ex. '95.2% hits (1000 hits, 50 misses)'
+	def stats(self):
+		total = max(self.hits + self.misses, 1)
+		return '%.1f%% hits (%d hits, %d misses)' %                           \
+			(100 * float(self.hits) / total, self.hits, self.misses)
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	def flush(self):
+		if self.pending == []:
+			return
+		accessed = time.time()
+		rows = [(key, alignment1, alignment2, float(score), int(length),
+			len(key) + len(alignment1) + len(alignment2) + 32, accessed)
+			for key, alignment1, alignment2, score, length in self.pending]
+		self.connection.executemany('INSERT OR REPLACE INTO alignments '
+			'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+		self.connection.commit()
+		self.pending = []
+
+	# remove least recently used alignments until total size is under max
+	def evict(self):
+		total = self.connection.execute('SELECT SUM(size) FROM alignments')  \
+			.fetchone()[0] or 0
+		if total <= self.max_size:
+			return
+		removed = []
+		for key, size in self.connection.execute('SELECT key, size FROM '
+			'alignments ORDER BY accessed'):
+			if total <= self.max_size:
+				break
+			removed.append((key,))
+			total -= size
+		self.connection.executemany('DELETE FROM alignments WHERE key = ?',
+			removed)
+		self.connection.commit()
+
+
+
+# key of alignment of seq1 and seq2 with parameters (scoring, mode, ...)
+def alignment_key(seq1, seq2, parameters):
+	sha1 = hashlib.sha1(hashlib.sha1(seq1).hexdigest() + '\t' +
+		hashlib.sha1(seq2).hexdigest() + '\t' + parameters)
+	return sha1.hexdigest()
@@ -0,0 +1,293 @@
+# Copyright © Garima Kapila
+
+from SequenceParser import gapped_positions
+import hashlib, mmap, numpy as np, os, pandas as pd, struct
+
+
+# first bytes of an alignment store, changed if the layout changes
+magic = 'PIPALN01'
+
+# magic, size and modification time of the global alignments file it was
+# built from, number of alignments and offsets of records, index, names,
+# sequences and edit operations
+header = struct.Struct('<8sQdQQQQQQ')
+
+# where the names, ungapped sequences and edit operations of each alignment
+# are, along with its score and length
+record_type = np.dtype([
+	('name', '<u8'), ('name_length', '<u4'),
+	('sequence1', '<u8'), ('length1', '<u4'),
+	('sequence2', '<u8'), ('length2', '<u4'),
+	('operations', '<u8'), ('operations_length', '<u4'),
+	('score', '<f8'), ('length', '<i8')
+])
+
+# hashes of (A, B) sorted with the record they belong to
+index_type = np.dtype([('hash', '<u8'), ('record', '<u8')])
+
+# columns of the global alignments file are read build_size rows at a time
+build_size = 50000
+
+# edit operations, whether alignment1 and/or alignment2 has a gap in a column
+MATCH, GAP1, GAP2, GAPS = 0, 1, 2, 3
+
+
+"""
+Read-only store of the global alignments of a Global_Alignments file, built
+next to it (ex. Global_Alignments_Homo-Sapiens_Mus-Musculus.aln) and rebuilt
+only if the file changes
+Each alignment is kept as runs of edit operations (like a CIGAR string) of
+the ungapped sequences, which are stored once per protein, and found through
+an index of hashes of (A, B); the file is memory mapped so only the pairs
+asked for are read
+ex. usage:
+global_alignments = alignment_store('Global_Alignments_HS_MM.csv')
+global_alignments[('P12345', 'Q67890')] -> {'alnA': ..., 'alnB': ...,
+	'score': ..., 'length': ..., 'positionsA': gapped_positions(alnA)}
+"""
+class AlignmentStore():
+
+	def __init__(self, global_alignments_file):
+		self.file = global_alignments_file
+		self.store_file = os.path.splitext(global_alignments_file)[0] + '.aln'
+		stat = os.stat(global_alignments_file)
+		# used to notice when the global alignments file is rewritten
+		self.signature = (stat.st_mtime, stat.st_size)
+
+		if not self.is_current():
+			write_store(global_alignments_file, self.store_file)
+		with open(self.store_file, 'rb') as f:
+			self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+		values = header.unpack_from(self.map, 0)
+		count, offsets = values[3], values[4:]
+		self.records = np.frombuffer(self.map, record_type, count, offsets[0])
+		index = np.frombuffer(self.map, index_type, count, offsets[1])
+		self.hashes, self.positions = index['hash'], index['record']
+		self.names, self.sequences, self.operations = offsets[2:]
+
+
+
+	# alignment of pair (A, B) of proteins
+	def __getitem__(self, pair):
+		k = self.find(pair)
+		if k == None:
+			raise KeyError(pair)
+		return self.alignment(k)
+
+	def __contains__(self, pair):
+		return self.find(pair) != None
+
+	def __len__(self):
+		return len(self.records)
+
+	# pairs (A, B) in the order of the global alignments file
+	def __iter__(self):
+		for offset, length in zip(self.records['name'].tolist(),
+			self.records['name_length'].tolist()):
+			yield tuple(self.read(self.names, offset, length).split('\t'))
+
+	def get(self, pair, default=None):
+		k = self.find(pair)
+		if k == None:
+			return default
+		return self.alignment(k)
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	# record of pair, None if it is not in the store
+	def find(self, pair):
+		name = '\t'.join(pair)
+		value = pair_hash(name)
+		k = np.searchsorted(self.hashes, value)
+		while k < len(self.hashes) and self.hashes[k] == value:
+			position = int(self.positions[k])
+			offset, length = self.records[position].tolist()[:2]
+			if self.read(self.names, offset, length) == name:
+				return position
+			k += 1
+		return None
+
+	# alignment of record k from its sequences and edit operations
+	def alignment(self, k):
+		name, name_length, sequence1, length1, sequence2, length2,           \
+			operations, operations_length, score, length =                    \
+			self.records[k].tolist()
+		seq1 = self.read(self.sequences, sequence1, length1)
+		seq2 = self.read(self.sequences, sequence2, length2)
+		operations = self.read(self.operations, operations, operations_length)
+		alignment1, alignment2 = apply_operations(seq1, seq2, operations)
+		return {'alnA': alignment1, 'alnB': alignment2, 'score': score,
+			'length': length, 'positionsA': gapped_positions(alignment1)}
+
+	def read(self, section, offset, length):
+		start = section + int(offset)
+		return self.map[start:start + int(length)]
+
+	# whether the store file was built from the current alignments file
+	def is_current(self):
+		if not os.path.exists(self.store_file):
+			return False
+		with open(self.store_file, 'rb') as f:
+			values = f.read(header.size)
+		if len(values) < header.size:
+			return False
+		values = header.unpack(values)
+		return values[0] == magic and values[1:3] ==                          \
+			(self.signature[1], self.signature[0])
+
+
+
+# stores shared by every caller, by global alignments file
+stores = {}
+
+"""
+returns the shared AlignmentStore of global_alignments_file, a new one is
+opened only if the file was rewritten since
+should be called before forking processes so they share the memory map
+"""
+def alignment_store(global_alignments_file):
+	stat = os.stat(global_alignments_file)
+	store = stores.get(global_alignments_file)
+	if store == None or store.signature != (stat.st_mtime, stat.st_size):
+		store = AlignmentStore(global_alignments_file)
+		stores[global_alignments_file] = store
+	return store
+
+
+
+### Building ###
+
+"""
+one pass over global alignments file in chunks, only the ungapped sequences
+and edit operations are held in memory; written to a temporary file that
+replaces store_file when it is complete
+"""
+def write_store(global_alignments_file, store_file):
+	stat = os.stat(global_alignments_file)
+	names, sequences, operations = Section(), Section(), Section()
+	# offset and length of sequence of each protein of each organism
+	proteins = [{}, {}]
+	records, hashes = [], []
+
+	chunks = pd.read_csv(global_alignments_file, sep = ',',
+		chunksize = build_size)
+	for chunk in chunks:
+		for A, B, alignment1, alignment2, score, length in zip(chunk.A,
+			chunk.B, chunk.Alignment1, chunk.Alignment2, chunk.Score,
+			chunk.Length):
+			alignment1, alignment2 = text(alignment1), text(alignment2)
+			name = '%s\t%s' % (A, B)
+			sequence1 = add_sequence(sequences, proteins[0], A, alignment1)
+			sequence2 = add_sequence(sequences, proteins[1], B, alignment2)
+			edits = edit_operations(alignment1, alignment2)
+			records.append((names.add(name), len(name)) + sequence1 +
+				sequence2 + (operations.add(edits), len(edits), score, length))
+			hashes.append(pair_hash(name))
+
+	records = np.array(records, dtype = record_type)
+	order = np.argsort(np.array(hashes, dtype = np.uint64), kind = 'mergesort')
+	index = np.zeros(len(records), dtype = index_type)
+	index['hash'] = np.array(hashes, dtype = np.uint64)[order]
+	index['record'] = order
+
+	offsets = [header.size]
+	for size in [records.nbytes, index.nbytes, names.size, sequences.size]:
+		offsets.append(offsets[-1] + size)
+	temp_file = '%s.%d.tmp' % (store_file, os.getpid())
+	with open(temp_file, 'wb') as f:
+		f.write(header.pack(magic, stat.st_size, stat.st_mtime, len(records),
+			*offsets))
+		f.write(records.tobytes())
+		f.write(index.tobytes())
+		for section in [names, sequences, operations]:
+			f.write(''.join(section.parts))
+	os.rename(temp_file, store_file)
+	return store_file
+
+# bytes of a section of the store added in parts
+class Section():
+
+	def __init__(self):
+		self.parts = []
+		self.size = 0
+
+	# returns offset of value in section
+	def add(self, value):
+		offset = self.size
+		self.parts.append(value)
+		self.size += len(value)
+		return offset
+
+# (offset, length) of ungapped sequence of protein, added once per protein
+def add_sequence(sequences, proteins, protein, alignment):
+	if protein not in proteins:
+		sequence = alignment.replace('-', '')
+		proteins[protein] = (sequences.add(sequence), len(sequence))
+	return proteins[protein]
+
+# missing alignments (ex. of empty sequences) are read as NaN
+def text(value):
+	if isinstance(value, str):
+		return value
+	return ''
+
+
+
+### Encoding ###
+
+# 64 bit hash of 'A\tB'
+def pair_hash(name):
+	return struct.unpack('<Q', hashlib.md5(name).digest()[:8])[0]
+
+"""
+runs of columns with the same operation (MATCH, GAP1, GAP2) encoded as
+varints of length * 4 + operation
+ex. 'AC--D', 'A-EFD' -> MATCH 1, GAP2 1, GAP1 2, MATCH 1
+"""
+def edit_operations(alignment1, alignment2):
+	if alignment1 == '':
+		return ''
+	gaps1 = np.frombuffer(alignment1, dtype = 'S1') == '-'
+	gaps2 = np.frombuffer(alignment2, dtype = 'S1') == '-'
+	columns = gaps1 * GAP1 + gaps2 * GAP2
+	starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+	lengths = np.diff(np.r_[starts, len(columns)])
+	return ''.join(varint(value) for value in
+		(lengths * 4 + columns[starts]).tolist())
+
+def varint(value):
+	characters = []
+	while value >= 0x80:
+		characters.append(chr(value & 0x7f | 0x80))
+		value >>= 7
+	characters.append(chr(value))
+	return ''.join(characters)
+
+# alignment1, alignment2 of ungapped seq1 and seq2 from edit operations
+def apply_operations(seq1, seq2, operations):
+	parts1, parts2 = [], []
+	position1, position2 = 0, 0
+	value, shift = 0, 0
+	for byte in bytearray(operations):
+		value |= (byte & 0x7f) << shift
+		if byte & 0x80:
+			shift += 7
+			continue
+		length, operation = value >> 2, value & 3
+		value, shift = 0, 0
+		if operation & GAP1:
+			parts1.append('-' * length)
+		else:
+			parts1.append(seq1[position1:position1 + length])
+			position1 += length
+		if operation & GAP2:
+			parts2.append('-' * length)
+		else:
+			parts2.append(seq2[position2:position2 + length])
+			position2 += length
+	return ''.join(parts1), ''.join(parts2)
@@ -1,16 +1,27 @@
 # Copyright © Garima Kapila
 
-import csv, os, pandas as pd, signal, subprocess, sys, time
+from FastaStore import fasta_store
+import datetime, numpy as np, os, pandas as pd, shutil, subprocess, sys, time
+
+
+# seconds between progress messages while blastp is running
+progress_interval = 2
+
+# bytes read from the end of a blast file that grew a lot since last read
+tail_size = 1 << 16
 
 
 """
 run blastp with progress messages
+workers > 1 splits the proteins of fasta_file1 into that many shards with
+about the same number of residues and runs one blastp per shard at the same
+time, each with threads threads; results are merged in query order
 ex. usage:
 run_blastp('Homo_Sapiens.fasta', 'Mus_Musculus.fasta')
 default returns 'Blast_Homo-Sapiens_Mus-Musculus.csv' with blast results
 """
 def run_blastp(fasta_file1, fasta_file2, blast_file='', output_format=10,
-	args=[], names = [], max_E_Value='1e-5'):
+	args=[], names = [], max_E_Value='1e-5', workers=1, threads=1):
 	
 	# create database using second organism's fasta file (fasta2)
 	make_blastp_DB(fasta_file2)
@@ -39,14 +50,28 @@ def run_blastp(fasta_file1, fasta_file2, blast_file='', output_format=10,
 	if blast_file == '':
 		blast_file = 'BlastP_' + organism1 + '_' + organism2 + '.csv'
 	
-	# shell command for running blastp
-	blast_results = 'blastp -query %s -db %s -out %s -evalue %s -outfmt'      \
-		% (fasta_file1, fasta_file2, blast_file, max_E_Value)
+	# query files, one per shard
+	if workers > 1:
+		query_files = split_fasta(fasta_file1, workers, blast_file)
+		out_files = [query_file + '.out' for query_file in query_files]
+	else:
+		query_files, out_files = [fasta_file1], [blast_file]
+
+	# shell command for running blastp on each query file
 	header = str(output_format) + ' ' + ' '.join(args)
-	blast_command = blast_results.split(' ') + [header]
+	blast_commands = []
+	for query_file, out_file in zip(query_files, out_files):
+		blast_results = 'blastp -query %s -db %s -out %s -evalue %s '         \
+			'-num_threads %d -outfmt' % (query_file, fasta_file2, out_file,
+			max_E_Value, threads)
+		blast_commands.append(blast_results.split(' ') + [header])
 
 	# run blast, remove files created for database when finished
-	start_blastp(blast_command, fasta_file1, blast_file)
+	start_blastp(blast_commands, query_files, out_files)
+	if workers > 1:
+		merge_files(out_files, blast_file)
+		for file in query_files + out_files:
+			os.remove(file)
 	blast = pd.read_csv(blast_file, sep = ',', header = None, names = names)
 	blast.to_csv(blast_file, index = False)
 	remove_blast_database_files(fasta_file2)
@@ -68,46 +93,128 @@ def make_blastp_DB(database):
 	subprocess.call(make_blast_DB_command.split(' '))
 
 
-def start_blastp(blast_command, fasta_file, blast_file):
+# run blast commands at the same time, each on query fasta_files[k] and
+# writing to blast_files[k], with progress read from the growing blast files
+def start_blastp(blast_commands, fasta_files, blast_files):
 	
-	# begin blast process
-	blast_process = subprocess.Popen(blast_command)
+	# begin blast processes
+	blast_processes = [subprocess.Popen(command) for command in blast_commands]
 
 	# initialize progress constants
-	fasta_list = list(csv.reader(open(fasta_file)))
-	total_prots = len(fasta_list)/2
-	current_prot_num = 0
-	
-	# print messages while blast process is incomplete
-	while blast_process.poll() == None:
+	monitors = [BlastProgress(fasta_file, blast_file)
+		for fasta_file, blast_file in zip(fasta_files, blast_files)]
+	total_prots = sum(len(monitor) for monitor in monitors)
+	start = time.time()
 	
-		# run for 5 seconds, then pause
-		os.kill(blast_process.pid, signal.SIGCONT)
-		time.sleep(5)
-		os.kill(blast_process.pid, signal.SIGSTOP)
-
-		# read current protein at last line of blast file
-		lastLine = subprocess.check_output(['tail', '-1', blast_file])
-		prot = lastLine.split(',')[0]
-		
-		# find current protein's position in fasta file
-		for i in range(current_prot_num, total_prots):
-			if fasta_list[i][0].strip('>') == prot:
-				current_prot_num = i
-				break
-		
-		# print progress message
-		progress = 100*float(current_prot_num)/total_prots
-		message = 'Running BLASTp \t\t\t%d%%\t%d/%d' %                        \
-			(progress, current_prot_num, total_prots)
-		sys.stdout.write('\r' + message); sys.stdout.flush()
-		
-		# resume blast process
-		os.kill(blast_process.pid, signal.SIGCONT)
-
-	message = 'BLASTp Complete \t\t100%%\t{0}/{0}\n\n'.format(total_prots)
+	# print messages while blast processes are incomplete
+	while any(process.poll() == None for process in blast_processes):
+		time.sleep(progress_interval)
+		current_prot_num = sum(monitor.update() for monitor in monitors)
+		print_blast_progress(current_prot_num, total_prots,
+			time.time() - start)
+
+	failed = [command for command, process in zip(blast_commands,
+		blast_processes) if process.returncode != 0]
+	if failed != []:
+		raise RuntimeError('blastp failed: %s' % ' '.join(failed[0]))
+
+	message = 'BLASTp Complete \t\t100%\t{0}/{0}\n\n'.format(total_prots)
 	sys.stdout.write('\r%s\n' % message); sys.stdout.flush()
 
+# progress, throughput and estimated time left of proteins finished so far
+def print_blast_progress(current_prot_num, total_prots, seconds):
+	progress = 100*float(current_prot_num)/max(total_prots, 1)
+	message = 'Running BLASTp \t\t\t%d%%\t%d/%d' %                            \
+		(progress, current_prot_num, total_prots)
+	if current_prot_num > 0:
+		rate = current_prot_num / max(seconds, 1e-9)
+		time_left = (total_prots - current_prot_num) / rate
+		message += '\t%.1f proteins/s, %s left' % (rate,
+			datetime.timedelta(seconds = int(time_left)))
+	sys.stdout.write('\r' + message); sys.stdout.flush()
+
+
+"""
+Progress of blastp from its output file while it is running, without pausing
+it: only bytes written since the last update are read, and the query protein
+of the last complete line is looked up in a dictionary of query positions
+ex. usage:
+monitor = BlastProgress('Homo-Sapiens.fasta', 'BlastP_HS_MM.csv')
+monitor.update()        # number of query proteins before the current one
+"""
+class BlastProgress():
+
+	def __init__(self, fasta_file, blast_file):
+		self.blast_file = blast_file
+		# blast reports the first word of the fasta header as query id
+		self.positions = dict((protein.split(' ')[0], k)
+			for k, protein in enumerate(fasta_store(fasta_file)))
+		# blast file is read from offset on, the start of an incomplete line
+		self.offset = 0
+		self.done = 0
+
+	def __len__(self):
+		return len(self.positions)
+
+	# number of query proteins finished, from lines written since last update
+	def update(self):
+		if not os.path.exists(self.blast_file):
+			return self.done
+		size = os.path.getsize(self.blast_file)
+		if size <= self.offset:
+			return self.done
+		# only the end is needed if a lot was written since last update
+		start = max(self.offset, size - tail_size)
+		with open(self.blast_file, 'rb') as f:
+			f.seek(start)
+			data = f.read(size - start)
+		lines = data.split('\n')
+		complete = lines[:-1]
+		# first line is cut off if reading started in the middle of it
+		if start != self.offset:
+			complete = complete[1:]
+		for line in reversed(complete):
+			position = self.positions.get(line.split(',', 1)[0])
+			if position != None:
+				self.done = max(self.done, position)
+				break
+		# next update starts at the incomplete last line
+		if len(lines) > 1:
+			self.offset = start + len(data) - len(lines[-1])
+		return self.done
+
+
+"""
+split proteins of fasta_file in order into at most num_shards files
+(prefix + '.shard0.fasta', ...) with about the same number of residues,
+returns names of shard files
+"""
+def split_fasta(fasta_file, num_shards, prefix):
+	fasta = fasta_store(fasta_file)
+	proteins = list(fasta)
+	residues = np.cumsum([fasta.length(protein) for protein in proteins])
+	total = residues[-1] if len(proteins) > 0 else 0
+	# shard k ends at the first protein reaching (k + 1) / num_shards of total
+	ends = np.searchsorted(residues, total * np.arange(1, num_shards) /
+		float(num_shards)) + 1
+	ends = np.minimum(ends, len(proteins))
+	bounds = sorted(set([0] + ends.tolist() + [len(proteins)]))
+	shard_files = []
+	for k, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+		shard_file = '%s.shard%d.fasta' % (prefix, k)
+		with open(shard_file, 'w') as f:
+			for protein in proteins[start:end]:
+				f.write('>' + protein + '\n' + fasta[protein] + '\n')
+		shard_files.append(shard_file)
+	return shard_files
+
+# concatenate files in order into out_file
+def merge_files(files, out_file):
+	with open(out_file, 'wb') as out:
+		for file in files:
+			with open(file, 'rb') as f:
+				shutil.copyfileobj(f, out)
+
 
 # remove files that are not needed anymore (for blastp database)
 def remove_blast_database_files(database):
@@ -1,22 +1,15 @@
 # Copyright © Garima Kapila
 
-import pandas as pd, time
+from FastaStore import fasta_store
+from ResidueSet import ResidueSet
+from SpecialSites import read_special_sites
+import numpy as np, pandas as pd
 
 
 
 ### Dictionaries ###
 
-# Returns fasta file as dictionary of (protein, sequence) pairs
-def fasta_as_dict(fasta_file):
-	fasta_dict = {}
-	with open(fasta_file) as f:
-		for line in f:
-			# format protein and sequence
-			protein = line.strip('>\r\n')
-			sequence = f.next().strip('\r\n')
-			# insert (protein, sequence) pair
-			fasta_dict[protein] = sequence
-	return fasta_dict
+# Fasta files are read through fasta_store(fasta_file), see FastaStore.py
 
 # Returns dictionary of interactions from interactome_file from HINT database
 def interactome_as_dict(interactome_file):
@@ -33,32 +26,42 @@ def interactome_as_dict(interactome_file):
 	interactome_dict.update(dict(zipped_interactome))
 	return interactome_dict
 
+# Returns interactions from interactome_file as rows A1, A2 in both orders
+def interactome_edges(interactome_file):
+	interactome = pd.read_csv(interactome_file, sep = '\t')
+	proteinsA, proteinsB = interactome.Uniprot_A, interactome.Uniprot_B
+	edges = pd.DataFrame({
+		'A1': pd.concat([proteinsA, proteinsB], ignore_index = True),
+		'A2': pd.concat([proteinsB, proteinsA], ignore_index = True)
+	})
+	return edges.drop_duplicates()
+
 
 """
-Get dictionary of keys protein1, protein2 with values indices1, indices2,
-database that interface residues are predicted from
-Has both orders of keys (protein1, protein2) and (protein2, protein1)
+Get dictionary of keys protein1, protein2 with values (indices1, indices2,
+database that interface residues are predicted from)
+Each pair is stored once with protein1 <= protein2, use interface_entry to
+look up proteins in either order
 """
 def interface_indices_as_dict(interfaces_file):
 	interfaces = pd.read_csv(interfaces_file, sep='\t')
 	indices_dict = {}
 	for prot1, prot2, db, indices1, indices2 in interfaces.values:
-		value = {'indices1': indices1, 'indices2': indices2, 'database': db}
-		indices_dict[prot1, prot2] = value
-		value = {'indices1': indices2, 'indices2': indices1, 'database': db}
-		indices_dict[prot2, prot1] = value
+		if prot2 <= prot1:
+			indices_dict[prot2, prot1] = (indices2, indices1, db)
+		else:
+			indices_dict[prot1, prot2] = (indices1, indices2, db)
 	return indices_dict
 
-
-# Returns dictionary of keys proteinA, proteinB with values sequenceA, sequenceB
-def global_alignments_as_dict(global_alignments_file):
-	global_alignments = pd.read_csv(global_alignments_file, sep=',')
-	global_alignments_dictionary = {}
-	for global_alignment in global_alignments.values:
-		A, B, alignment1, alignment2, score, length = global_alignment
-		values = {'alnA': alignment1, 'alnB': alignment2}
-		global_alignments_dictionary[A, B] = values
-	return global_alignments_dictionary
+# (indices1, indices2, database) of proteins A1 and A2 from
+# interface_indices_as_dict, None if A1 and A2 have no interface
+def interface_entry(interface_indices, A1, A2):
+	if A2 < A1:
+		entry = interface_indices.get((A2, A1))
+		if entry != None:
+			entry = entry[1], entry[0], entry[2]
+		return entry
+	return interface_indices.get((A1, A2))
 
 
 """
@@ -80,18 +83,18 @@ def interact_prots_as_dict(interactome_file, col1, col2):
 
 
 """
-get (protein, zipped residues) dictionary
-zipped residues are combined occurrances
+get (protein, interface ResidueSet) dictionary
+residues are combined occurrances
 ex.
 interfaces_file values:
 P1 	   P1_IRES	  P2     P2_IRES
 Prot1 '[1, 2, 4]' Prot2 '[3, 4, 5]'
 Prot1 '[3, 5, 4]' Prot1 '[7, 8, 10]'
 Prot2 '[1, 2, 4]' Prot3 '[4, 5, 6]'
-returns dictionary with entries:
-Prot1 '[1, 2, 4,3, 5, 4,7, 8, 10]'
-Prot2 '[3, 4, 5,1, 2, 4]'
-Prot3 '[4, 5, 6]
+returns dictionary with entries (1-based):
+Prot1 [1-5,7-8,10]
+Prot2 [1-5]
+Prot3 [4-6]
 """
 def zipped_interface_residues_as_dict(interfaces_file):
 	interfaces = pd.read_csv(interfaces_file, sep='\t')
@@ -109,34 +112,27 @@ def zipped_interface_residues_as_dict(interfaces_file):
 
 
 """
-get (protein, zipped residues) dictionary
-zipped residues are combined across all special sites
+get (protein, ResidueSet) dictionary of special sites
+sites are merged across all special site categories
+"""
+def special_sites_as_dict(special_sites_file):
+	special_sites = read_special_sites(special_sites_file)
+	return dict((protein, ResidueSet.from_intervals(starts, ends))
+		for protein, (starts, ends) in special_sites.iteritems())
+
+
+"""
+get (protein, ResidueSet of all its domain envelopes) dictionary, proteins
+with several domains have one interval per domain (merged where they overlap)
+so residues inside any domain are counted with ResidueSet.intersection_count
 """
-def zipped_special_sites_as_dict(special_sites_file):
-	special_sites = pd.read_csv(special_sites_file, sep=',')
-	prots = special_sites['Entry']
-	special_sites = special_sites.drop(columns=['Entry'])
-	special_sites_dict = {}
-	for prot, sites in zip(prots, special_sites.values):
-		combined_sites = ''
-		for site in sites:
-			if site != None:
-				combined_sites = combine_zipped_indices(combined_sites, site)
-		for i in range(2, 10):
-			commas = ',' * (10 - i)
-			combined_sites = combined_sites.replace(commas, ',')
-		combined_sites = '[' + combined_sites[1:].strip(',')
-		if combined_sites[-1] != ']':
-			combined_sites += ']'
-		special_sites_dict[prot] = combined_sites
-	return special_sites_dict
-
-
-# get (protein, domain range (start, end)) dictionary
 def domain_sites_dict(pfam_file):
 	pfam = pd.read_csv(pfam_file, sep='\t')
-	domain_region = zip(pfam['envelope start'], pfam['envelope end'])
-	return dict(zip(pfam['seq id'], domain_region))
+	starts = pfam['envelope start'].values
+	ends = pfam['envelope end'].values
+	rows = pfam.groupby('seq id').indices
+	return dict((protein, ResidueSet.from_intervals(starts[k], ends[k]))
+		for protein, k in rows.iteritems())
 
 
 """
@@ -165,12 +161,12 @@ occur between them
 ex. ('B', 'A') : {'C': 0.5, 'D': 0.2, 'Y': 0.3} 
 """
 def gap_pattern_as_dict(fasta_file):
-	fasta = fasta_as_dict(fasta_file)
+	fasta = fasta_store(fasta_file)
 	pattern_dict = {}
-	random = int(time.time())
-	mod_random = len(fasta) / 30
+	# about 30 proteins spread over the fasta file, the same ones every run
+	step = max(1, len(fasta) / 30)
 	for i, protein in enumerate(fasta):
-		if (i + random) % mod_random == 0:
+		if i % step == 0:
 			sequence = fasta[protein]
 			for j, r_left in enumerate(sequence):
 				if j < len(sequence) - 2:
@@ -195,89 +191,44 @@ def gap_pattern_as_dict(fasta_file):
 
 ### Helper Functions ###
 
+# boolean array of whether each (first[k], second[k]) is a key of pairs_dict
+def pairs_in_dict(first, second, pairs_dict):
+	if len(pairs_dict) == 0:
+		return np.zeros(len(first), dtype = bool)
+	pairs = pd.MultiIndex.from_arrays([np.asarray(first), np.asarray(second)])
+	return pairs.isin(pairs_dict.keys())
+
+# read csv file in DataFrames of size rows, at least one (empty) DataFrame
+def read_chunks(csv_file, size):
+	return pd.read_csv(csv_file, sep=',', chunksize = size)
+
+# number of rows in csv file without reading it into memory
+def count_rows(csv_file):
+	with open(csv_file) as f:
+		return sum(1 for line in f) - 1
+
 """
-adds indices to protein key in indices_dict or concatenates to current
-indices value if protein key already exists in indices_dict 
+adds zipped indices to protein key in indices_dict or combines with current
+ResidueSet if protein key already exists in indices_dict
 """
-def update_indices_dict(indices_dict, protein, indices):
+def update_indices_dict(indices_dict, protein, zipped_indices):
+	indices = ResidueSet.parse(zipped_indices)
 	if protein in indices_dict:
-		current_indices = indices_dict[protein]
-		combined = combine_zipped_indices(current_indices, indices)
-		indices_dict[protein] = combined
+		indices_dict[protein] = indices_dict[protein] | indices
 	else:
 		indices_dict[protein] = indices
 	return indices_dict
 
-"""
-concatenates 2 zipped residues
-ex. combine_zipped_indices('[10, 2, 3]', '[1-7,8]')
-returns '[10, 2, 3,1-7,8]'
-"""
-def combine_zipped_indices(zipped_indices1, zipped_indices2):
-	if zipped_indices1 == zipped_indices2:
-		return zipped_indices1
-	range1 = zipped_indices1.strip(']')
-	range2 = zipped_indices2.strip('[')
-	return range1 + ',' + range2
-
 
 
 
 ### Lists ###
 
 
-"""
-unzips and decrements indices
-ex. [1,2 ,3-5,2-3, 8-11] = [0, 1, 2, 3, 4, 7, 8, 9, 10]
-"""
-def parse_zipped_indices(zipped_indices):
-	indices = unzip_indices_string(zipped_indices)
-	indices = decrement_indices(indices)
-	return indices
-
-"""
-input is string of indices and returns a list of indices
-ex.
-'[1 ,2,8,7,3 ,4, 5-8, 15-17,10-19]'
-becomes 
-[1, 2, 3, 4, 5, 6, 7, 8, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]
-"""
-def unzip_indices_string(zipped_indices_string):
-	indices_string = zipped_indices_string.strip('[]').replace(' ', '')
-	entries = indices_string.split(',')
-	indices = []
-	for entry in entries:
-		try:
-			index_range = entry.split('-')
-			start, end = index_range
-			indices += unzip_start_end(int(start), int(end))
-		except ValueError:
-			if entry != '':
-				indices.append(int(entry))
-	indices = sorted(set(indices))
-	return indices
-
-def unzip_start_end(start, end):
-	return [i for i in range(start, end + 1)]
-
 # ex. flatten([[1], [2], [3, 4]]) = [1, 2, 3, 4]
 def flatten(inflated_list):
 	return [item for sublist in inflated_list for item in sublist]
 
-def num_overlapping(list1, list2):
-	return len(set(list1).intersection(list2))
-
-"""
-add values at corresponding indices in two lists
-ex. add_counts([1, 4, 6], [2, 3, 5]) = [3, 7, 11]
-"""
-def add_lists(list1, list2):
-	return [v1 + v2 for v1, v2 in zip(list1, list2)]
-
-# ex. [1, 2, 3] becomes [0, 1, 2]
-def decrement_indices(indices_list):
-	return [i - 1 for i in indices_list]
-
 """
 increment values of a list from start_index to end_index inclusive
 ex. increment_values([1, 2, 3, 4, 5], 1, 3) = [1, 3, 4, 5, 5]
@@ -290,12 +241,6 @@ def increment_values(values_list, start_index, end_index):
 
 
 
-# return string of characters at specific indices
-def extract_characters(string, indices):
-	return ''.join([string[i] for i in indices])
-
-
-
 # add prefix to each column name in columns except for those in exceptions list
 def add_prefix(columns, prefix, exceptions=[]):
 	columns = [
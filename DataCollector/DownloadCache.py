@@ -0,0 +1,204 @@
+# Copyright © Garima Kapila
+
+from Downloader import Downloader
+import hashlib, json, os, shutil, sys, threading, time
+
+
+"""
+Persistent on-disk cache for files downloaded from the databases
+Downloads are stored once under the sha1 of their contents (content-addressed)
+in directory/objects, and index.json maps each request (source url + organism
+and option) to its stored object along with ETag/Last-Modified validators
+Transfers are done by a Downloader, it is safe to fetch from several threads
+ex. usage:
+cache = DownloadCache('Cache', ttl=7*24*3600, max_size=5*1024**3)
+cache.fetch(url, 'Homo-Sapiens-Interactome.tsv', key='Homo-Sapiens')
+"""
+class DownloadCache():
+
+	def __init__(self, directory='Cache', ttl=7*24*3600, max_size=5*1024**3,
+		offline=False, downloader=None):
+		self.directory = directory
+		# seconds a cached file is served without revalidating it
+		self.ttl = ttl
+		# bytes kept on disk before least recently used files are evicted
+		self.max_size = max_size
+		# only serve files that are already in the cache
+		self.offline = offline
+
+		if downloader == None:
+			downloader = Downloader()
+		self.downloader = downloader
+
+		# partial downloads are kept so interrupted transfers can resume
+		self.objects = os.path.join(directory, 'objects')
+		self.partial = os.path.join(directory, 'partial')
+		for path in [self.objects, self.partial]:
+			if not os.path.exists(path):
+				os.makedirs(path)
+		self.index_file = os.path.join(directory, 'index.json')
+		self.index = self.read_index()
+		self.remove_unreferenced()
+
+		# index lock, and one lock per request so it is downloaded only once
+		self.lock = threading.Lock()
+		self.entry_locks = {}
+
+
+
+	# copy contents of url into file, downloading only if cache is out of date
+	def fetch(self, url, file, key='', fresh=False):
+		shutil.copyfile(self.locate(url, key, fresh), file)
+		return file
+
+	# open contents of url for reading, downloading only if out of date
+	def open(self, url, key='', fresh=False):
+		return open(self.locate(url, key, fresh), 'rb')
+
+	"""
+	return path of cached object with contents of url
+	fresh = revalidate even if time-to-live has not expired
+	"""
+	def locate(self, url, key='', fresh=False):
+		entry_id = self.entry_id(url, key)
+		with self.lock:
+			entry_lock = self.entry_locks.setdefault(entry_id,
+				threading.Lock())
+
+		with entry_lock:
+			entry = self.index.get(entry_id)
+			previous = None
+			if entry != None:
+				previous = entry['object']
+			if self.offline:
+				if entry == None or not self.has_object(entry):
+					raise IOError('Offline and not in download cache: %s'     \
+						% url)
+			elif entry == None or not self.has_object(entry):
+				entry = self.download(url, key, entry_id)
+			elif fresh or time.time() - entry['checked'] > self.ttl:
+				entry = self.revalidate(url, key, entry_id, entry)
+
+			with self.lock:
+				entry['accessed'] = time.time()
+				self.index[entry_id] = entry
+				# older version of a file that was updated upstream
+				if previous != None and previous != entry['object']:
+					self.remove_object(previous)
+				self.evict(keep = entry_id)
+				self.write_index()
+				return self.object_path(entry['object'])
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	# request key is source url plus organism/option
+	def entry_id(self, url, key):
+		return hashlib.sha1(url + '\t' + key).hexdigest()
+
+	def object_path(self, digest):
+		return os.path.join(self.objects, digest)
+
+	def has_object(self, entry):
+		return os.path.exists(self.object_path(entry['object']))
+
+	# conditional request, cached file is kept if server reports no changes
+	def revalidate(self, url, key, entry_id, entry):
+		headers = {}
+		if entry.get('etag'):
+			headers['If-None-Match'] = entry['etag']
+		if entry.get('last_modified'):
+			headers['If-Modified-Since'] = entry['last_modified']
+		try:
+			updated = self.download(url, key, entry_id, headers)
+			if updated != None:
+				return updated
+		except IOError as error:
+			# serve stale file rather than fail when database is unreachable
+			message = '\n> Using cached copy, could not reach %s' % url
+			sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
+		entry['checked'] = time.time()
+		return entry
+
+	# download url into cache directory, returns None if not modified
+	def download(self, url, key, entry_id, headers={}):
+		temp_file = os.path.join(self.partial, entry_id)
+		status, response_headers = self.downloader.download(url, temp_file,
+			headers)
+		if status == 304:
+			return None
+
+		# content-addressed, identical files are only stored once
+		sha1, size = hashlib.sha1(), 0
+		with open(temp_file, 'rb') as f:
+			chunk = f.read(1 << 16)
+			while chunk:
+				sha1.update(chunk)
+				size += len(chunk)
+				chunk = f.read(1 << 16)
+		digest = sha1.hexdigest()
+		if os.path.exists(self.object_path(digest)):
+			os.remove(temp_file)
+		else:
+			os.rename(temp_file, self.object_path(digest))
+
+		entry = {
+			'url': url,
+			'key': key,
+			'object': digest,
+			'size': size,
+			'etag': response_headers.get('etag'),
+			'last_modified': response_headers.get('last-modified'),
+			'checked': time.time()
+		}
+		return entry
+
+	# remove least recently used files until cache fits in max_size
+	def evict(self, keep=''):
+		sizes = dict((entry['object'], entry['size'])
+			for entry in self.index.values())
+		total = sum(sizes.values())
+		by_access = sorted(self.index.items(),
+			key = lambda item: item[1].get('accessed', 0))
+		for entry_id, entry in by_access:
+			if total <= self.max_size:
+				break
+			if entry_id == keep:
+				continue
+			del self.index[entry_id]
+			digest = entry['object']
+			if self.remove_object(digest):
+				total -= sizes[digest]
+
+	# objects can be shared by several requests with same contents, returns
+	# whether digest was removed because no request refers to it anymore
+	def remove_object(self, digest):
+		if any(entry['object'] == digest for entry in self.index.values()):
+			return False
+		if os.path.exists(self.object_path(digest)):
+			os.remove(self.object_path(digest))
+		return True
+
+	# objects left by earlier runs that no request refers to (ex. stopped
+	# before the index was written), called before any download starts
+	def remove_unreferenced(self):
+		digests = set(entry['object'] for entry in self.index.values())
+		for digest in os.listdir(self.objects):
+			if digest not in digests:
+				os.remove(self.object_path(digest))
+
+	def read_index(self):
+		if not os.path.exists(self.index_file):
+			return {}
+		with open(self.index_file, 'r') as f:
+			return json.load(f)
+
+	# write to temporary file first so index is never left half written
+	def write_index(self):
+		temp_file = self.index_file + '.tmp'
+		with open(temp_file, 'w') as f:
+			json.dump(self.index, f, indent = 1, sort_keys = True)
+		os.rename(temp_file, self.index_file)
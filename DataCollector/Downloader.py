@@ -0,0 +1,267 @@
+# Copyright © Garima Kapila
+
+import ftplib, httplib, json, os, Queue, socket, sys, threading, time
+import urlparse, zlib
+
+
+"""
+Download engine used by DownloadCache
+- keeps connections alive and reuses them for requests to the same host
+- asks for gzip encoded responses and decompresses them once complete
+- resumes interrupted transfers from the partial file with HTTP Range
+  (FTP REST for ftp urls)
+- retries failed transfers, waiting backoff * 2^attempt seconds in between
+- runs functions in a bounded pool of worker threads
+ex. usage:
+downloader = Downloader(workers = 5)
+status, headers = downloader.download(url, 'Homo-Sapiens.fasta')
+"""
+class Downloader():
+
+	def __init__(self, workers=5, retries=4, backoff=1.0, timeout=60):
+		self.workers = workers
+		self.retries = retries
+		self.backoff = backoff
+		self.timeout = timeout
+		# idle connections by (scheme, host)
+		self.connections = {}
+		self.lock = threading.Lock()
+
+
+
+	"""
+	download url into file, returns (status, headers)
+	status is 304 and file is left untouched if headers has conditions
+	(ex. If-None-Match) and the file has not changed
+	"""
+	def download(self, url, file, headers={}):
+		for attempt in range(self.retries + 1):
+			try:
+				if urlparse.urlsplit(url).scheme == 'ftp':
+					return self.download_ftp(url, file)
+				return self.download_http(url, file, headers)
+			except (socket.error, httplib.HTTPException, ftplib.Error,
+				RetryError) as error:
+				if attempt == self.retries:
+					raise DownloadError('Failed to download %s: %s'           \
+						% (url, error))
+				message = '\n> Retrying %s (%s)' % (url, error)
+				sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
+				time.sleep(self.backoff * 2 ** attempt)
+
+
+	"""
+	call each function in functions using at most self.workers threads
+	returns results in the same order as functions, first error is raised
+	"""
+	def run(self, functions):
+		tasks = Queue.Queue()
+		for i, function in enumerate(functions):
+			tasks.put((i, function))
+		results, errors = [None] * len(functions), []
+
+		def work():
+			while not errors:
+				try:
+					i, function = tasks.get_nowait()
+				except Queue.Empty:
+					return
+				try:
+					results[i] = function()
+				except Exception:
+					errors.append(sys.exc_info())
+
+		threads = [threading.Thread(target = work)
+			for i in range(min(self.workers, len(functions)))]
+		for thread in threads:
+			thread.daemon = True
+			thread.start()
+		for thread in threads:
+			thread.join()
+		if errors:
+			error_type, error, traceback = errors[0]
+			raise error_type, error, traceback
+		return results
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	"""
+	requested is the url asked for before any redirects, partial downloads are
+	kept under it so they can be resumed even if the server redirects
+	"""
+	def download_http(self, url, file, headers, redirects=5, requested=None):
+		part_file, info_file = file + '.part', file + '.part.info'
+		if requested == None:
+			requested = url
+		request_headers = dict(headers)
+		request_headers['Accept-Encoding'] = 'gzip'
+
+		# resume partial download of the same url if the server still has the
+		# same version of the file (If-Range)
+		offset = self.resume_offset(requested, part_file, info_file)
+		if offset > 0:
+			request_headers['Range'] = 'bytes=%d-' % offset
+			request_headers['If-Range'] = self.read_info(info_file)['validator']
+
+		scheme, host, path, query, fragment = urlparse.urlsplit(url)
+		if query != '':
+			path += '?' + query
+		connection = self.get_connection(scheme, host)
+		try:
+			connection.request('GET', path or '/', headers = request_headers)
+			response = connection.getresponse()
+			status = response.status
+			response_headers = dict(response.getheaders())
+
+			if status in (301, 302, 303, 307, 308) and redirects > 0:
+				response.read()
+				location = urlparse.urljoin(url, response_headers['location'])
+				self.release_connection(scheme, host, connection)
+				return self.download_http(location, file, headers,
+					redirects - 1, requested)
+			if status == 416:
+				# partial file is stale, start over
+				response.read()
+				self.remove_partial(part_file, info_file)
+				raise RetryError('requested range not satisfiable')
+			if status >= 500:
+				raise RetryError('HTTP %d %s' % (status, response.reason))
+			if status >= 400:
+				raise DownloadError('HTTP %d %s: %s' % (status,
+					response.reason, url))
+			if status == 304:
+				response.read()
+				self.release_connection(scheme, host, connection)
+				return status, response_headers
+
+			if status == 206 and offset > 0:
+				mode = 'ab'
+			elif status == 206:
+				# range was not asked for, there is nothing to append to
+				response.read()
+				self.remove_partial(part_file, info_file)
+				raise RetryError('unexpected partial content')
+			else:
+				mode, offset = 'wb', 0
+				validator = response_headers.get('etag',
+					response_headers.get('last-modified', ''))
+				self.write_info(info_file, requested, validator)
+
+			expected = response_headers.get('content-length')
+			received = self.stream(response, part_file, mode)
+			if expected != None and received != int(expected):
+				raise RetryError('received %d of %s bytes'                    \
+					% (received, expected))
+		except:
+			connection.close()
+			raise
+		self.release_connection(scheme, host, connection)
+
+		# decompress gzip encoded response into file
+		if response_headers.get('content-encoding') == 'gzip':
+			self.gunzip(part_file, file)
+			os.remove(part_file)
+		else:
+			os.rename(part_file, file)
+		os.remove(info_file)
+		return status, response_headers
+
+
+	# ftp servers send no validators, REST is used to resume partial files
+	def download_ftp(self, url, file):
+		part_file, info_file = file + '.part', file + '.part.info'
+		offset = self.resume_offset(url, part_file, info_file)
+		if offset == 0:
+			self.write_info(info_file, url, '')
+
+		scheme, host, path, query, fragment = urlparse.urlsplit(url)
+		ftp = ftplib.FTP(host, timeout = self.timeout)
+		try:
+			ftp.login()
+			with open(part_file, 'ab' if offset > 0 else 'wb') as f:
+				ftp.retrbinary('RETR ' + path, f.write, rest = offset or None)
+		finally:
+			ftp.close()
+
+		os.rename(part_file, file)
+		os.remove(info_file)
+		return 200, {}
+
+
+	# number of bytes already downloaded for url
+	def resume_offset(self, url, part_file, info_file):
+		if not os.path.exists(part_file) or not os.path.exists(info_file):
+			return 0
+		info = self.read_info(info_file)
+		if info['url'] != url or (info['validator'] == '' and
+			not url.startswith('ftp')):
+			self.remove_partial(part_file, info_file)
+			return 0
+		return os.path.getsize(part_file)
+
+	def stream(self, response, file, mode):
+		received = 0
+		with open(file, mode) as f:
+			chunk = response.read(1 << 16)
+			while chunk:
+				received += len(chunk)
+				f.write(chunk)
+				chunk = response.read(1 << 16)
+		return received
+
+	def gunzip(self, gzip_file, file):
+		decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+		with open(gzip_file, 'rb') as reader, open(file, 'wb') as writer:
+			chunk = reader.read(1 << 16)
+			while chunk:
+				writer.write(decompressor.decompress(chunk))
+				chunk = reader.read(1 << 16)
+			writer.write(decompressor.flush())
+
+	def read_info(self, info_file):
+		with open(info_file, 'r') as f:
+			return json.load(f)
+
+	def write_info(self, info_file, url, validator):
+		with open(info_file, 'w') as f:
+			json.dump({'url': url, 'validator': validator}, f)
+
+	def remove_partial(self, part_file, info_file):
+		for file in [part_file, info_file]:
+			if os.path.exists(file):
+				os.remove(file)
+
+
+	### Connection pool ###
+
+	# reuse an idle kept-alive connection to host if there is one
+	def get_connection(self, scheme, host):
+		with self.lock:
+			idle = self.connections.get((scheme, host), [])
+			if idle:
+				return idle.pop()
+		if scheme == 'https':
+			return httplib.HTTPSConnection(host, timeout = self.timeout)
+		return httplib.HTTPConnection(host, timeout = self.timeout)
+
+	def release_connection(self, scheme, host, connection):
+		with self.lock:
+			idle = self.connections.setdefault((scheme, host), [])
+			if len(idle) < self.workers:
+				idle.append(connection)
+			else:
+				connection.close()
+
+
+
+# download failed and should not be retried
+class DownloadError(IOError):
+	pass
+
+# download failed but may succeed if retried
+class RetryError(Exception):
+	pass
@@ -0,0 +1,146 @@
+# Copyright © Garima Kapila
+
+from collections import OrderedDict
+import mmap, os
+
+
+"""
+Read-only fasta file with an offset index, sequences are read from a memory
+map only when asked for
+The index is saved next to the fasta file (ex. Homo-Sapiens.fasta.fai) with
+the columns of samtools faidx, after a first line with the size and
+modification time of the fasta file, and rebuilt only if they changed:
+protein, length, offset, bases per line, bytes per line
+ex. usage:
+fasta = fasta_store('Homo-Sapiens.fasta')
+fasta['P12345'], fasta.length('P12345'), 'P12345' in fasta
+"""
+class FastaStore():
+
+	def __init__(self, fasta_file):
+		self.file = fasta_file
+		self.index_file = fasta_file + '.fai'
+		stat = os.stat(fasta_file)
+		# used to notice when the fasta file is rewritten
+		self.signature = (stat.st_mtime, stat.st_size)
+
+		self.index = self.read_index()
+		if self.index == None:
+			self.index = self.build_index()
+			self.write_index()
+
+		# empty files cannot be memory mapped
+		if stat.st_size > 0:
+			with open(fasta_file, 'rb') as f:
+				self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+		else:
+			self.map = ''
+
+
+
+	# sequence of protein
+	def __getitem__(self, protein):
+		length, offset, line_bases, line_width = self.index[protein]
+		if length == 0:
+			return ''
+		# bytes spanned by sequence including line endings
+		full_lines, remainder = divmod(length, line_bases)
+		end = offset + full_lines * line_width + remainder
+		sequence = self.map[offset:end]
+		if line_width != line_bases:
+			sequence = sequence.replace('\n', '').replace('\r', '')
+		return sequence
+
+	def __contains__(self, protein):
+		return protein in self.index
+
+	def __len__(self):
+		return len(self.index)
+
+	# proteins in the order of the fasta file
+	def __iter__(self):
+		return iter(self.index)
+
+	def keys(self):
+		return self.index.keys()
+
+	def iteritems(self):
+		for protein in self.index:
+			yield protein, self[protein]
+
+	# length of sequence without reading it
+	def length(self, protein):
+		return self.index[protein][0]
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	# one pass over file, remembering where each sequence starts
+	def build_index(self):
+		index = OrderedDict()
+		protein, entry = None, None
+		offset = 0
+		with open(self.file, 'rb') as f:
+			for line in f:
+				if line.startswith('>'):
+					protein = line.strip('>\r\n')
+					# length, offset, bases per line, bytes per line
+					entry = [0, offset + len(line), 0, 0]
+					index[protein] = entry
+				elif entry != None:
+					bases = len(line.rstrip('\r\n'))
+					if entry[2] == 0:
+						entry[2], entry[3] = bases, len(line)
+					entry[0] += bases
+				offset += len(line)
+		for protein, entry in index.iteritems():
+			# sequences without bases
+			if entry[2] == 0:
+				entry[2], entry[3] = 1, 1
+			index[protein] = tuple(entry)
+		return index
+
+	# None if there is no index or it was built from another version of file
+	def read_index(self):
+		if not os.path.exists(self.index_file):
+			return None
+		index = OrderedDict()
+		with open(self.index_file, 'r') as f:
+			if f.readline() != self.signature_line():
+				return None
+			for line in f:
+				protein, length, offset, line_bases, line_width =             \
+					line.rstrip('\n').split('\t')
+				index[protein] = (int(length), int(offset), int(line_bases),
+					int(line_width))
+		return index
+
+	def write_index(self):
+		with open(self.index_file, 'w') as f:
+			f.write(self.signature_line())
+			for protein, entry in self.index.iteritems():
+				f.write(protein + '\t' + '\t'.join(map(str, entry)) + '\n')
+
+	# ex. '# 1048576 1529884800.25\n', size and modification time of file
+	def signature_line(self):
+		return '# %d %r\n' % (self.signature[1], self.signature[0])
+
+
+
+# stores shared by every caller, by fasta file
+stores = {}
+
+"""
+returns the shared FastaStore of fasta_file, a new one is opened only if the
+file was rewritten since (ex. after filtering)
+"""
+def fasta_store(fasta_file):
+	stat = os.stat(fasta_file)
+	store = stores.get(fasta_file)
+	if store == None or store.signature != (stat.st_mtime, stat.st_size):
+		store = FastaStore(fasta_file)
+		stores[fasta_file] = store
+	return store
@@ -0,0 +1,148 @@
+# Copyright © Garima Kapila
+
+import numpy as np
+
+
+"""
+Lookup table of every residue comparison category (ex. counts, blosum scores,
+molecule and secondary structure differences) for all 21 x 21 pairs of
+residues and gap, so comparing two aligned sequences is a gather and a sum
+instead of calling each category function for each pair of residues
+Sequences are encoded as uint8 arrays, values are added in sequence order so
+results are the same as adding the function outputs one pair at a time
+ex. usage:
+kernel = feature_kernel([counts_difference, blosum_score_difference])
+kernel.differences('AC-D', 'AEFD')
+kernel.batch_differences([('AC-D', 'AEFD'), ('MK', 'MR')])
+"""
+class FeatureKernel():
+
+	alphabet = 'ACDEFGHIKLMNPQRSTVWY-'
+
+	def __init__(self, functions):
+		self.functions = functions
+		size = len(self.alphabet)
+		# code of each character, characters outside alphabet are invalid
+		self.codes = np.full(256, 255, dtype = np.uint8)
+		for code, residue in enumerate(self.alphabet):
+			self.codes[ord(residue)] = code
+
+		rows = [self.compare(r1, r2) for r1 in self.alphabet
+			for r2 in self.alphabet]
+		self.num_features = len(next(row for row in rows if row != None))
+		# pairs a function cannot compare (ex. gap with gap)
+		self.valid = np.array([row != None for row in rows] + [True])
+		# last row is all zeros, for padding batches
+		self.table = np.zeros((size * size + 1, self.num_features))
+		for k, row in enumerate(rows):
+			if row != None:
+				self.table[k] = row
+		# features that are sums of integers stay integers (ex. counts)
+		self.int_features = [
+			all(row == None or isinstance(row[f], (int, long, bool))
+				for row in rows)
+			for f in range(self.num_features)
+		]
+
+
+
+	# list of summed category values for two aligned sequences
+	def differences(self, sequence1, sequence2):
+		pairs = self.encode(sequence1, sequence2)
+		if pairs is None:
+			return self.slow_differences(sequence1, sequence2)
+		if len(pairs) == 0:
+			return [0] * self.num_features
+		# cumulative sum adds values in sequence order
+		totals = np.cumsum(self.table[pairs], axis = 0)[-1]
+		return self.as_list(totals)
+
+	"""
+	differences of many pairs of aligned sequences at once, returns a list of
+	results in the same order as pairs
+	alignments of similar length are padded into a matrix and summed together
+	"""
+	def batch_differences(self, pairs, max_cells=1 << 22):
+		results = [None] * len(pairs)
+		encoded = []
+		for k, (sequence1, sequence2) in enumerate(pairs):
+			codes = self.encode(sequence1, sequence2)
+			if codes is None:
+				results[k] = self.slow_differences(sequence1, sequence2)
+			elif len(codes) == 0:
+				results[k] = [0] * self.num_features
+			else:
+				encoded.append((len(codes), k, codes))
+		encoded.sort()
+
+		# padding code points to all zeros row, adding 0 does not change sums
+		padding = len(self.table) - 1
+		start = 0
+		while start < len(encoded):
+			# entries are sorted by length, so the one added is the longest and
+			# sets the width of the padded matrix
+			end = start + 1
+			while end < len(encoded) and (end - start + 1) *                  \
+				encoded[end][0] * self.num_features <= max_cells:
+				end += 1
+			batch = encoded[start:end]
+			length = batch[-1][0]
+			matrix = np.full((len(batch), length), padding, dtype = np.intp)
+			for row, (size, k, codes) in enumerate(batch):
+				matrix[row, :size] = codes
+			# summed along each sequence, so values are added in sequence order
+			totals = self.table[matrix].sum(axis = 1)
+			for row, (size, k, codes) in enumerate(batch):
+				results[k] = self.as_list(totals[row])
+			start = end
+		return results
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	# pair codes of aligned sequences, None if a pair is not in the table
+	def encode(self, sequence1, sequence2):
+		length = min(len(sequence1), len(sequence2))
+		codes1 = self.codes[np.frombuffer(sequence1[:length], np.uint8)]
+		codes2 = self.codes[np.frombuffer(sequence2[:length], np.uint8)]
+		if (codes1 == 255).any() or (codes2 == 255).any():
+			return None
+		pairs = codes1.astype(np.intp) * len(self.alphabet) + codes2
+		if not self.valid[pairs].all():
+			return None
+		return pairs
+
+	# category values for one pair of residues, None if they cannot compare
+	def compare(self, residue1, residue2):
+		try:
+			return [value for function in self.functions
+				for value in function(residue1, residue2)]
+		except (KeyError, ValueError, ZeroDivisionError):
+			return None
+
+	def as_list(self, totals):
+		return [int(round(value)) if is_int else value
+			for value, is_int in zip(totals.tolist(), self.int_features)]
+
+	# one pair at a time, raises same errors as the category functions
+	def slow_differences(self, sequence1, sequence2):
+		results = [0] * self.num_features
+		for residue1, residue2 in zip(sequence1, sequence2):
+			values = [value for function in self.functions
+				for value in function(residue1, residue2)]
+			results = [v1 + v2 for v1, v2 in zip(results, values)]
+		return results
+
+
+
+# kernels shared by every caller, by category functions
+kernels = {}
+
+def feature_kernel(functions):
+	key = tuple(functions)
+	if key not in kernels:
+		kernels[key] = FeatureKernel(functions)
+	return kernels[key]
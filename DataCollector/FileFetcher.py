@@ -1,6 +1,9 @@
 # Copyright © Garima Kapila
 
-import bs4, csv, os, subprocess, sys, urllib, urllib2
+from DownloadCache import DownloadCache
+from FastaStore import fasta_store
+from SpecialSites import parse_special_sites, write_special_sites
+import csv, gzip, subprocess, sys
 
 
 """
@@ -16,14 +19,19 @@ Database websites used:
 2. HINT: http://hint.yulab.org
 3. Interactome INSIDER: http://interactomeinsider.yulab.org
 4. The European Bioinformatics Institute: https://www.ebi.ac.uk
+
+Downloads go through a DownloadCache, so repeated runs only revalidate files
 """
 
 
 class FileFetcher():
 
-	# input organism is of type Organism
-	def __init__(self, organism):
+	# input organism is of type Organism, cache is of type DownloadCache
+	def __init__(self, organism, cache=None):
 		self.organism = organism
+		if cache == None:
+			cache = DownloadCache()
+		self.cache = cache
 
 
 
@@ -37,10 +45,11 @@ class FileFetcher():
 		message = 'Fetching Fasta for %s' % self.organism.info
 		sys.stdout.write('\r' + message); sys.stdout.flush()
 
-		# get page contents of url in file
-		contents = self.get_fasta_page_contents()
+		# stream formatted page contents of url into file
+		with self.open_fasta_page() as page:
+			num_prots = self.format_fasta(page, file)
 		# no proteins exist
-		if len(contents) == 0 and self.organism.strain != '':
+		if num_prots == 0 and self.organism.strain != '':
 			# try with less specific strain
 			new_strain = self.organism.strain[:-1]
 
@@ -48,14 +57,11 @@ class FileFetcher():
 			message = '\n> Searching Less Specific Strain: %s' % new_strain
 			sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
 
-			# get page contents of url in file
+			# stream formatted page contents of url into file
 			params = self.organism.genus, self.organism.epithet
 			params = params + (new_strain,)
-			contents = self.get_fasta_page_contents(params)
-
-		with open(file, 'w') as fasta:
-			fasta.write(contents)
-		self.format_fasta()
+			with self.open_fasta_page(params) as page:
+				self.format_fasta(page, file)
 
 		return file
 
@@ -75,7 +81,7 @@ class FileFetcher():
 		name = self.organism.genus[0] + '_' + self.organism.epithet.lower()
 		url = 'http://interactomeinsider.yulab.org/downloads/interfaces'      \
 			'{0}/{1}_interfaces{0}.txt'.format(option, name)
-		urllib.urlretrieve(url, file)
+		self.cache.fetch(url, file, key = self.organism.name + option)
 		
 		# find # of interactions, print progress message
 		numLines = subprocess.check_output(['wc', '-l', file]).split(' ')[-2]
@@ -101,7 +107,7 @@ class FileFetcher():
 		# fetch high-quality interactome binary file
 		name = ''.join(self.organism.params)
 		url = 'http://hint.yulab.org/download/%s/binary/hq/' % name
-		urllib.urlretrieve(url, file)
+		self.cache.fetch(url, file, key = self.organism.name)
 
 		# find number of interactions, print progress message
 		numLines = subprocess.check_output(['wc', '-l', file]).split(' ')[-2]
@@ -118,7 +124,7 @@ class FileFetcher():
 	def fetch_special_sites(self, file='', special_sites=[]):
 		
 		if file == '':
-			file = self.organism.name + '-Special-Sites.csv'
+			file = self.organism.name + '-Special-Sites.npz'
 
 		# print progress message
 		message = 'Fetching Special Sites for %s' % self.organism.info
@@ -136,11 +142,9 @@ class FileFetcher():
 				'site'
 			]
 
-		# get page contents of url in file
-		contents = self.get_fasta_page_contents()
 		params = self.organism.params
 		# no proteins exist
-		if len(contents) == 0 and self.organism.strain != '':
+		if self.fasta_page_is_empty() and self.organism.strain != '':
 			# try with less specific strain
 			new_strain = self.organism.strain[:-1]
 
@@ -148,18 +152,13 @@ class FileFetcher():
 			message = '\n> Searching Less Specific Strain: %s' % new_strain
 			sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
 
-			# get page contents of url in file
 			params = self.organism.genus, self.organism.epithet
 			params = params + (new_strain,)
 
-		# fetch indices of the special sites
+		# fetch indices of the special sites, save them as intervals
 		url = self.get_special_sites_url(special_sites, params)
-		soup = str(bs4.BeautifulSoup(urllib2.urlopen(url), 'html.parser'))
-		
-		with open(file, 'w') as special_sites_file:
-			special_sites_file.write(soup)
-		
-		self.format_special_sites(file)
+		with self.cache.open(url, key = self.organism.name) as page:
+			self.format_special_sites(page, file)
 
 		message = 'Formatted Special Sites for %s' % self.organism.info
 		sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
@@ -168,44 +167,68 @@ class FileFetcher():
 
 
 
-	# Domain indices from The European Bioinformatics Institute/Pfam database
-	def fetch_pfam(self, file=''):
+	"""
+	Domain indices from The European Bioinformatics Institute/Pfam database
+	The archive is decompressed while streaming it from the download cache,
+	only proteins in fasta_file are kept (all if not given) and only the
+	columns needed for domain sites are written, one row per domain
+	"""
+	def fetch_pfam(self, file='', fasta_file='', columns=[]):
 
 		if file == '':
 			file = self.organism.name + '-Pfam.tsv'
 
+		# default columns to keep
+		if columns == []:
+			columns = [
+				'seq id',
+				'envelope start',
+				'envelope end',
+				'hmm acc',
+				'hmm name'
+			]
+
 		# print progress message
 		message = 'Fetching Domain and Family Info for %s' % self.organism.info
 		sys.stdout.write('\r' + message); sys.stdout.flush()
-		
-		pfam_file = str(self.organism.get_taxon_ID()) + '.tsv.gz'
-		url = 'ftp://ftp.ebi.ac.uk/pub/databases/Pfam/releases/'              \
-			'Pfam31.0/proteomes/' + pfam_file
-		urllib.urlretrieve(url, pfam_file)
-		subprocess.call(['gunzip', pfam_file])
-
-		os.rename(pfam_file[:-3], file)
-
-		# format header
-		with open(file, 'r') as reader:
-			data = reader.read().splitlines(True)[2:]
-			total = len(data)
-		with open(file, 'w') as writer:
-			column_names = data[0].split('<')
-			character_list = '#>'
+
+		# proteins to keep
+		if fasta_file != '':
+			proteins = set(fasta_store(fasta_file).keys())
+
+		kept = set()
+		with self.cache.open(self.get_pfam_url(), key = self.organism.name)   \
+			as archive, open(file, 'w') as writer:
+			reader = gzip.GzipFile(fileobj = archive, mode = 'rb')
+			# skip 2 comment lines, format header
+			reader.readline(), reader.readline()
+			column_names = reader.readline().split('<')
+			character_list = '#>\r\n'
 			for i, col in enumerate(column_names):
 				for c in character_list:
 					col = col.replace(c, '')
-					column_names[i] = col.strip(' ')
-			data[0] = '\t'.join(column_names)[1:]
-			writer.writelines(data)
+				column_names[i] = col.strip(' ')
+			column_names = column_names[1:]
+			indices = [column_names.index(col) for col in columns]
+			writer.write('\t'.join(columns) + '\n')
+
+			for line in reader:
+				row = line.rstrip('\r\n').split('\t')
+				if fasta_file == '' or row[0] in proteins:
+					kept.add(row[0])
+					writer.write('\t'.join(row[i] for i in indices) + '\n')
 
 		message = 'Fetched Domain and Family Info for %s' % self.organism.info
-		message += ': %d proteins' % total
+		message += ': %d proteins' % len(kept)
 		sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
 
 		return file
 
+	# download Pfam archive into the cache, used to fetch it in parallel
+	# before fasta file is filtered
+	def download_pfam(self):
+		self.cache.locate(self.get_pfam_url(), key = self.organism.name)
+
 
 
 
@@ -218,13 +241,24 @@ class FileFetcher():
 	#  Helper methods #
 	###################
 	
-	def get_fasta_page_contents(self, params=()):
+	# open UniProt fasta page for organism (params) through the cache
+	def open_fasta_page(self, params=()):
 		url = self.get_fasta_url(params)
-		soup = str(bs4.BeautifulSoup(urllib2.urlopen(url), 'html.parser'))
-		return soup
+		return self.cache.open(url, key = self.organism.name)
+
+	# True if UniProt has no proteins for the organism (params)
+	def fasta_page_is_empty(self, params=()):
+		with self.open_fasta_page(params) as page:
+			return page.read(1) == ''
 
 
-	def format_fasta(self, file=''):
+	"""
+	normalize fasta from reader (ex. http response) into file while streaming
+	it in chunks: headers only keep the protein ID, sequences are one line
+	only one sequence is held in memory at a time, returns number of proteins
+	ex. '>sp|P12345|NAME_HUMAN Name OS=Homo sapiens' becomes '>P12345'
+	"""
+	def format_fasta(self, reader, file=''):
 
 		if file == '':
 			file = self.organism.name +'.fasta'
@@ -234,38 +268,34 @@ class FileFetcher():
 		message = 'Formatting Fasta for %s' % info
 		sys.stdout.write('\r' + message); sys.stdout.flush()
 
-		# read lines of file as list
-		fasta = list(csv.reader(open(file)))
-
-		fastaList, seq = [], ''
-		for entry in fasta:
-			line = entry[0]
-			# line is protein ID, indicated by the character '&gt' = '>'
-			if '&gt' in line:
-				# next protein ID found, add/clear sequence of previous protein
-				fastaList.append([seq])
-				seq = ''
-				# format and add protein ID
-				name = line.split('\t')[0]
-				protID = name.split('|')[1]
-				line = '>' + protID
-				fastaList.append([line])
-			# build sequence, keep adding lines until next protein ID is found
-			else:
-				seq += line
-		# add last protein's sequence
-		fastaList.append([seq])
-
-		# write formatted fasta into file without header
+		numProt, sequence = 0, []
 		with open(file, 'w') as outfile:
-			csv.writer(outfile).writerows(fastaList[1:])
-		
-		numProt = len(fastaList)/2
+			for line in read_lines(reader):
+				# line is protein ID, write sequence of previous protein
+				if line.startswith('>'):
+					if numProt > 0:
+						outfile.write(''.join(sequence) + '\n')
+					sequence = []
+					outfile.write('>' + protein_ID(line) + '\n')
+					numProt += 1
+				# build sequence, keep adding lines until next protein ID
+				else:
+					sequence.append(line)
+			# add last protein's sequence
+			if numProt > 0:
+				outfile.write(''.join(sequence) + '\n')
+
 		message = 'Formatted Fasta for {}: {} proteins'.format(info, numProt)
 		sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
 
-		return file
+		return numProt
+
 
+	def get_pfam_url(self):
+		pfam_file = str(self.organism.get_taxon_ID()) + '.tsv.gz'
+		url = 'ftp://ftp.ebi.ac.uk/pub/databases/Pfam/releases/'              \
+			'Pfam31.0/proteomes/' + pfam_file
+		return url
 
 	def get_fasta_url(self, params=()):
 
@@ -308,29 +338,41 @@ class FileFetcher():
 		return url
 
 
-	# group all indices across special sites together
-	def format_special_sites(self, file):
-		rows = list(csv.reader(open(file), delimiter='\t'))
-
-		for i, row in enumerate(rows[1:]):
-			for j in range(1, len(row)):
-				row[j] = row[j].split(' ')
-				k = 0
-				res = '['
-				while k < len(row[j]):
-					if row[j][k].isdigit():
-						num1 = int(row[j][k])
-						k += 1
-						if row[j][k].isdigit():
-							num2 = int(row[j][k])
-							if len(res) > 1:
-								res += ','
-							if num1 == num2 and num1: res += str(num1) + ''
-							else: res += str(num1) + '-' + str(num2) + ''
-					k += 1
-				rows[i+1][j] = res + ']'
+	"""
+	parse special sites of each protein from reader (UniProt tab format) into
+	sorted start/end intervals per category, saved in file (see SpecialSites)
+	"""
+	def format_special_sites(self, reader, file):
+		rows = csv.reader(read_lines(reader), delimiter='\t')
+		categories, sites = parse_special_sites(rows)
+		write_special_sites(file, categories, sites)
+		return file
+
 
-		with open(file, 'w') as outfile:
-			csv.writer(outfile).writerows(rows)
 
 
+
+"""
+lines of reader without line endings, read in chunks of chunk_size bytes
+so the whole response is never held in memory
+"""
+def read_lines(reader, chunk_size=1 << 16):
+	remainder = ''
+	chunk = reader.read(chunk_size)
+	while chunk:
+		lines = (remainder + chunk).splitlines()
+		# last line may continue in the next chunk
+		remainder = lines.pop() if chunk[-1] not in '\r\n' else ''
+		for line in lines:
+			if line != '':
+				yield line
+		chunk = reader.read(chunk_size)
+	if remainder != '':
+		yield remainder
+
+# ex. '>sp|P12345|NAME_HUMAN Name' returns 'P12345', '>P12345' returns 'P12345'
+def protein_ID(header):
+	header = header.lstrip('>').split(' ')[0]
+	if '|' in header:
+		return header.split('|')[1]
+	return header
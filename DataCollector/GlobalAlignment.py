@@ -1,55 +1,67 @@
 # Copyright © Garima Kapila
 
 import Bio.pairwise2 as pairwise, Bio.SubsMat.MatrixInfo as mat, datetime, sys
+import hashlib, itertools, multiprocessing, os, time
+from AlignmentCache import alignment_key
+from Aligner import best_global_alignment, hsp_band
 from SequenceParser import *
 from DataParser import *
 
 
+# inputs of get_global_alignments, worker processes are forked after they are
+# read so they share them instead of receiving copies
+shared = {}
+
+# seconds between progress messages
+progress_interval = 0.5
+
+# number of finished alignments written to the output file at once
+write_size = 1000
+
+# number of pairs of orthologs aligned longest first at a time
+window_size = 20000
+
+# scoring of global alignments, more information at:
+# http://biopython.org/DIST/docs/api/Bio.pairwise2-module.html
+matrix_name, gap_open, gap_extend = 'blosum62', -10, -0.5
+
+
+"""
+Get the best global alignment of each pair of orthologs, in parallel with
+jobs processes, longest pairs of each window_size pairs are aligned first so
+processes finish together
+Finished alignments are appended to a journal (file_name + '.journal') right
+away, so if the program stops it continues from the journal next time
+mode = 'best' (one traceback), 'banded' (around BLAST HSP of the pair) or
+'all' (every optimal alignment), see global_alignment
+Pairs found in cache (AlignmentCache) are not aligned again, and new
+alignments are added to it
+"""
 def get_global_alignments(orthologs_file, fasta_file1, fasta_file2, 
-	interfaces_file1='', file_name=''):
+	interfaces_file1='', file_name='', jobs=1, mode='best', band_width=32,
+	cache=None):
 
 	date_time = datetime.datetime.now().strftime("%m/%d/%Y %H:%M:%S")
 	message = '\n\nStarting Global Alignments, current time: %s' % date_time
 	sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
 
 	# read input files
-	fasta1 = fasta_as_dict(fasta_file1)
-	fasta2 = fasta_as_dict(fasta_file2)
+	fasta1 = fasta_store(fasta_file1)
+	fasta2 = fasta_store(fasta_file2)
 	orthologs = pd.read_csv(orthologs_file, sep = ',')
-	total_orthologs = len(orthologs)
+	pairs = zip(orthologs.A, orthologs.B)
+	total_orthologs = len(pairs)
+
+	# banded alignments follow the BLAST HSP of each pair
+	hsps = [None] * total_orthologs
+	if mode == 'banded':
+		hsps = blast_hsps(orthologs)
 
 	# also get best global alignments for interface residues
+	indices = {}
 	if interfaces_file1 != '':
 		indices = zipped_interface_residues_as_dict(interfaces_file1)
-	
-	global_alignments = []
-	
-	for i, pair in enumerate(zip(orthologs.A, orthologs.B)):
-
-		# print progress message
-		progress = 100*float(i)/total_orthologs
-		message = 'Getting Global Alignments \t\t%d%%\t%d/%d' %               \
-			(progress, i, total_orthologs)
-		sys.stdout.write('\r' + message); sys.stdout.flush()
-		
-		# get protein sequences
-		protein_A, protein_B = pair
-		sequences = fasta1[protein_A], fasta2[protein_B]
-		
-		# global alignment parameters if interface residues are considered
-		if interfaces_file1 == '':
-			args = sequences + (indices[protein_A],)
-		else:
-			args = sequences
-		
-		# get global alignment
-		result = (protein_A,protein_B,) + global_alignment(*args)
-		global_alignments.append(result)
 
-	# add global alignment column names
-	cols = ['A', 'B', 'Alignment1', 'Alignment2', 'Score', 'Length']
-	global_alignments = pd.DataFrame(global_alignments, columns = cols)
-	
 	# default file name
 	if file_name == '':
 		organism1 = fasta_file1.split('.')[0]
@@ -57,34 +69,229 @@ def get_global_alignments(orthologs_file, fasta_file1, fasta_file2,
 		name = organism1 + '_' + organism2
 		file_name = 'Global_Alignments_' + name + '.csv'
 
+	shared.update({
+		'pairs': pairs,
+		'fasta1': fasta1,
+		'fasta2': fasta2,
+		'indices': indices,
+		'interfaces_file1': interfaces_file1,
+		'mode': mode,
+		'hsps': hsps,
+		'band_width': band_width
+	})
+
+	# alignments finished before the program stopped last time
+	journal_file = file_name + '.journal'
+	fingerprint = alignments_fingerprint(pairs, fasta1, fasta2,
+		interfaces_file1, '%s %d' % (mode, band_width))
+	finished = read_journal(journal_file, fingerprint)
+	if len(finished) > 0:
+		journal = open(journal_file, 'a')
+	else:
+		journal = open(journal_file, 'w')
+		journal.write('# ' + fingerprint + '\n')
+		journal.flush()
+
+	remaining = [k for k in range(total_orthologs) if k not in finished]
+
+	# alignments of the same sequences with the same parameters from before
+	keys = {}
+	if cache != None:
+		keys = dict((k, cached_alignment_key(k)) for k in remaining)
+		cached = cache.get_many(keys.values())
+		for k in remaining:
+			if keys[k] in cached:
+				finished[k] = pairs[k] + cached[keys[k]]
+		remaining = [k for k in remaining if k not in finished]
+
+	# longest pairs first within windows of pairs in order, so alignments
+	# waiting in memory to be written are at most about a window
+	order = []
+	for start in range(0, len(remaining), window_size):
+		window = remaining[start:start + window_size]
+		window.sort(key = lambda k: -fasta1.length(pairs[k][0]) *
+			fasta2.length(pairs[k][1]))
+		order += window
+
+	# write alignments in order of orthologs as soon as all before are done
+	cols = ['A', 'B', 'Alignment1', 'Alignment2', 'Score', 'Length']
+	temp_file = file_name + '.tmp'
+	writer = open(temp_file, 'w')
+	pool = None
+	# pool processes are stopped and files closed even if writing fails
+	try:
+		if jobs > 1:
+			pool = multiprocessing.Pool(jobs)
+			results = pool.imap_unordered(align_pair, order)
+		else:
+			results = itertools.imap(align_pair, order)
+
+		pd.DataFrame(columns = cols).to_csv(writer, sep = ',', index = False)
+		next_k = write_finished(writer, finished, 0, cols)
+		done, last_message = len(finished), 0
+		for k, result in results:
+			journal.write(journal_line(k, result))
+			journal.flush()
+			finished[k] = result
+			if cache != None:
+				cache.put(keys[k], result[2:])
+			next_k = write_finished(writer, finished, next_k, cols)
+			done += 1
+
+			# print progress message
+			if time.time() - last_message >= progress_interval:
+				last_message = time.time()
+				progress = 100*float(done)/total_orthologs
+				message = 'Getting Global Alignments \t\t%d%%\t%d/%d' %       \
+					(progress, done, total_orthologs)
+				sys.stdout.write('\r' + message); sys.stdout.flush()
+
+		write_finished(writer, finished, next_k, cols, final = True)
+	finally:
+		writer.close()
+		journal.close()
+		# every result was read if alignments finished, so nothing is lost
+		if pool != None:
+			pool.terminate()
+			pool.join()
+	os.rename(temp_file, file_name)
+	os.remove(journal_file)
+	if cache != None:
+		cache.save()
+
 	# print progress
 	message = 'Finished Getting Global Alignments \t100%\t{0}/{0}\n\n'        \
 		.format(total_orthologs)
 	sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
+	if cache != None:
+		print '> Alignment cache:\t %s' % cache.stats()
 
-	# write global alignments into file and return file name
-	global_alignments.to_csv(file_name, sep = ',', index = False)
 	return file_name
 
 
+# global alignment of pair k of orthologs, run in pool processes
+def align_pair(k):
+	protein_A, protein_B = shared['pairs'][k]
+	sequences = shared['fasta1'][protein_A], shared['fasta2'][protein_B]
+
+	# global alignment parameters if interface residues are considered
+	if shared['interfaces_file1'] != '':
+		args = sequences + (shared['indices'].get(protein_A, ResidueSet()),)
+	else:
+		args = sequences
+
+	# get global alignment
+	result = (protein_A,protein_B,) + global_alignment(*args,
+		mode = shared['mode'], hsp = shared['hsps'][k],
+		band_width = shared['band_width'])
+	return k, result
+
+# key of pair k of orthologs in the alignment cache, from its sequences,
+# scoring, mode and interface residues (which can break ties)
+def cached_alignment_key(k):
+	protein_A, protein_B = shared['pairs'][k]
+	parameters = [matrix_name, repr(gap_open), repr(gap_extend),
+		shared['mode']]
+	if shared['mode'] == 'banded':
+		parameters += [str(shared['band_width']), str(shared['hsps'][k])]
+	if shared['interfaces_file1'] != '':
+		indices = shared['indices'].get(protein_A, ResidueSet())
+		parameters.append(indices.zipped())
+	return alignment_key(shared['fasta1'][protein_A],
+		shared['fasta2'][protein_B], ' '.join(parameters))
+
+"""
+write rows of finished alignments from next_k on until one is missing,
+rows are written write_size at a time unless final, returns next row to write
+"""
+def write_finished(writer, finished, next_k, cols, final=False):
+	end = next_k
+	while end in finished:
+		end += 1
+	if end - next_k >= write_size or (final and end > next_k):
+		rows = [finished.pop(k) for k in range(next_k, end)]
+		rows = pd.DataFrame(rows, columns = cols)
+		rows.to_csv(writer, sep = ',', index = False, header = False)
+		return end
+	return next_k
+
+
+
+### Journal of finished alignments ###
+
+# k, proteins, alignments, score and length of alignment as a line
+def journal_line(k, result):
+	protein_A, protein_B, alignment1, alignment2, score, length = result
+	values = [k, protein_A, protein_B, alignment1, alignment2, repr(score),
+		length]
+	return '\t'.join(map(str, values)) + '\n'
+
+"""
+dictionary of k: alignment results in journal_file, empty if there is no
+journal or it was written for other orthologs, sequences or interfaces
+"""
+def read_journal(journal_file, fingerprint):
+	finished = {}
+	if not os.path.exists(journal_file):
+		return finished
+	with open(journal_file, 'r') as f:
+		if f.readline() != '# ' + fingerprint + '\n':
+			return finished
+		for line in f:
+			values = line.split('\t')
+			# last line can be cut off if program stopped while writing it
+			if not line.endswith('\n') or len(values) != 7:
+				break
+			k, protein_A, protein_B, alignment1, alignment2, score, length = \
+				values
+			finished[int(k)] = (protein_A, protein_B, alignment1, alignment2,
+				float(score), int(length))
+	return finished
+
+# hash of pairs of orthologs, their sequences, interfaces file and mode
+def alignments_fingerprint(pairs, fasta1, fasta2, interfaces_file1, mode):
+	sha1 = hashlib.sha1(interfaces_file1 + '\t' + mode)
+	for protein_A, protein_B in pairs:
+		sha1.update('%s\t%s\t%s\t%s\n' % (protein_A, protein_B,
+			fasta1[protein_A], fasta2[protein_B]))
+	return sha1.hexdigest()
+
+"""
+(Start_A, End_A, Start_B, End_B) of BLAST HSP of each ortholog, columns can
+also have the 'Blast_' prefix of labeled orthologs, None if there are none
+"""
+def blast_hsps(orthologs):
+	columns = ['Start_A', 'End_A', 'Start_B', 'End_B']
+	for prefix in ['', 'Blast_']:
+		names = [prefix + column for column in columns]
+		if all(name in orthologs.columns for name in names):
+			return zip(*[orthologs[name].astype(int) for name in names])
+	return [None] * len(orthologs)
+
+
 """
 Helper method for get_global_alignments
 Get best alignment by number identical global, then by number identical
-interface residues if zipped indices are given
+interface residues if residue_indices (ResidueSet) are given
+mode = 'best' breaks ties while tracing back a single alignment (Aligner),
+'banded' does the same only for cells within band_width diagonals of the
+BLAST hsp (Start_A, End_A, Start_B, End_B), widened if needed,
+'all' lists every optimal alignment with Bio.pairwise2 and compares them,
+which can take very long for repetitive sequences
 """
-def global_alignment(seq1, seq2, zipped_residues='[-1]'):
+def global_alignment(seq1, seq2, residue_indices=ResidueSet(), mode='best',
+	hsp=None, band_width=32):
 
-	# get (optional) interface residues
-	if zipped_residues != '[-1]':
-		residue_indices = unzip_indices_string(zipped_residues)
-		residue_indices = decrement_indices(residue_indices)
-	else:
-		residue_indices = []
+	matrix = getattr(mat, matrix_name)
+	if mode == 'best':
+		return best_global_alignment(seq1, seq2, residue_indices, matrix,
+			gap_open, gap_extend)
+	if mode == 'banded':
+		band = hsp_band(hsp, len(seq1), len(seq2), band_width)
+		return best_global_alignment(seq1, seq2, residue_indices, matrix,
+			gap_open, gap_extend, band = band)
 
-	# assign gap penalties, more information at:
-	# http://biopython.org/DIST/docs/api/Bio.pairwise2-module.html
-	gap_open, gap_extend  = -10, -0.5
-	global_alignment_args = (seq1, seq2, mat.blosum62, gap_open, gap_extend)
+	global_alignment_args = (seq1, seq2, matrix, gap_open, gap_extend)
 	global_alignments     = pairwise.align.globalds(*global_alignment_args)
 	
 	# get best alignment by number identical global, number identical interface
@@ -99,10 +306,10 @@ def global_alignment(seq1, seq2, zipped_residues='[-1]'):
 		global_identical = num_identical(alignment1, alignment2)
 
 		# sum identical non-gap residues from only the interface residues 
-		if residue_indices != []:
-			temp_indices = shift_gap_indices(alignment1, residue_indices)
-			interface_seq1 = extract_characters(alignment1, temp_indices)
-			interface_seq2 = extract_characters(alignment2, temp_indices)
+		if len(residue_indices) > 0:
+			positions = shift_gap_indices(alignment1, residue_indices)
+			interface_seq1 = gather_characters(alignment1, positions)
+			interface_seq2 = gather_characters(alignment2, positions)
 			interface_identical = num_identical(interface_seq1, interface_seq2)
 		else:
 			interface_identical = 0
@@ -1,95 +1,219 @@
 # Copyright © Garima Kapila
 
+from AlignmentStore import alignment_store
 from SequenceParser import *
 from GlobalAlignment import *
 from DataParser import *
 from ResidueComparator import *
-import numpy as np, sys
+from SiteCache import SiteCache
+import heapq, multiprocessing, numpy as np, os, sys
+
+
+# number of interologs held in memory at once, files are read/written in chunks
+chunk_size = 50000
+
+# number of pairs of proteins with parsed interface residues kept in memory
+site_cache_size = 100000
+
+# lookup tables of add_interface_information, worker processes are forked
+# after they are read so they share them instead of receiving copies
+shared = {}
 
 
 """
 Compare residues at interface regions using global alignments
+jobs = number of processes to compare interologs with
 """
 def add_interface_information(interologs_file, interfaces_file1,
 	global_alignments_file, special_sites_file, pfam_file, fasta_file1,
-	out_file=''):
+	out_file='', jobs=1):
 
 	filter_interologs(interologs_file, interfaces_file1)
 
 	# read input files
-	global_alignments = global_alignments_as_dict(global_alignments_file)
-	interologs = pd.read_csv(interologs_file, sep=',')
+	global_alignments = alignment_store(global_alignments_file)
 	interface_indices = interface_indices_as_dict(interfaces_file1)
+	interface_sites = SiteCache(
+		lambda pair: parse_interface(interface_indices, *pair),
+		site_cache_size)
 	columns, functions = default_interface_compare_categories()
+	# column types are decided once so every chunk is written the same way,
+	# differences over no residues are int zeros
+	floats = [name for name, value in zip(columns, [value
+		for function in functions for value in function('A', 'A')])
+		if isinstance(value, float)]
 	columns += ['Interface_Residues_Length']
 
 	# double columns for each pair of orthologs
 	columns = double_columns(columns) + ['Interface_Database']
 	
-	special_sites = zipped_special_sites_as_dict(special_sites_file)
+	special_sites = special_sites_as_dict(special_sites_file)
 	domains = domain_sites_dict(pfam_file)
 	gap_pattern_dict = gap_pattern_as_dict(fasta_file1)
 	set_gap_dict(gap_pattern_dict)
 
-	total_interologs = len(interologs)
-	interologs = interologs[['A1', 'A2', 'B1', 'B2']]
-
-	values = []
-	for i, (A1, A2, B1, B2) in enumerate(interologs.values):
-		
-		progress = 100*float(i)/total_interologs
-		message = 'Adding Interface Information \t\t%d%%\t%d/%d' %            \
-			(progress, i, total_interologs)
-		sys.stdout.write('\r' + message); sys.stdout.flush()
-			
-		interface_dict = interface_indices[(A1, A2)]
-
-		indices1 = interface_dict['indices1']
-		indices2 = interface_dict['indices2']
-		db = interface_dict['database']
-		
-		global_alns1 = global_alignments[(A1, B1)]
-		global_alns2 = global_alignments[(A2, B2)]
-		indices1 = parse_zipped_indices(indices1)
-		indices2 = parse_zipped_indices(indices2)
-
-		diff1 = get_site_differences(A1, B1, indices1, global_alns1, functions)
-		diff2 = get_site_differences(A2, B2, indices2, global_alns2, functions)
-		gap_score1 = gap_pattern_score(indices1, global_alns1)
-		gap_score2 = gap_pattern_score(indices2, global_alns2)
-
-		value_pair_1 = diff1 + [len(indices1)]
-		value = value_pair_1 + diff2 + [len(indices2), db]
-
-		overlaps1 = overlapping_interface(A1, special_sites, domains, indices1)
-		overlaps2 = overlapping_interface(A1, special_sites, domains, indices2)
-
-		value += overlaps1 + overlaps2 + [gap_score1, gap_score2]
-		values.append(value)
+	columns += overlapping_names('Pair_1') + overlapping_names('Pair_2')
+	columns += ['Interface_Gap_Score_Pair_1', 'Interface_Gap_Score_Pair_2']
+	types = dict.fromkeys(double_columns(floats) +
+		['Interface_Gap_Score_Pair_1', 'Interface_Gap_Score_Pair_2'], float)
+
+	shared.update({
+		'interface_indices': interface_indices,
+		'interface_sites': interface_sites,
+		'global_alignments': global_alignments,
+		'special_sites': special_sites,
+		'domains': domains,
+		'functions': functions
+	})
+	pool = None
+	if jobs > 1:
+		pool = multiprocessing.Pool(jobs)
+
+	total_interologs = count_rows(interologs_file)
+	if out_file == '':
+		out_file = interologs_file
+	# write to temporary file, out_file can be the file being read
+	temp_file = out_file + '.tmp'
+
+	# pool processes are stopped even if comparing a chunk fails
+	try:
+		with open(temp_file, 'w') as writer:
+			i = 0
+			chunks = read_chunks(interologs_file, chunk_size)
+			for k, interologs in enumerate(chunks):
+				rows = interologs[['A1', 'A2', 'B1', 'B2']].values.tolist()
+				if pool == None:
+					values = []
+					for A1, A2, B1, B2 in rows:
+						print_progress(i, total_interologs)
+						values.append(interface_information(A1, A2, B1, B2,
+							interface_sites, global_alignments, special_sites,
+							domains, functions))
+						i += 1
+				else:
+					values = parallel_interface_information(rows, pool, jobs,
+						i, total_interologs)
+					i += len(rows)
+
+				# combine dataframes
+				values = pd.DataFrame(values, columns = columns,
+					index = interologs.index).astype(types)
+				values = values.round(3)
+				interologs = pd.concat([interologs, values], axis = 1)
+				interologs = move_col_to_end(interologs, 'Database')
+				interologs = move_col_to_end(interologs, 'Label')
+				interologs.to_csv(writer, sep=',', index=False,
+					header = (k == 0))
+	finally:
+		if pool != None:
+			pool.close()
+			pool.join()
+	os.rename(temp_file, out_file)
 
 	# print progress
 	message = 'Finished Adding Interface Information \t100%\t{0}/{0}'         \
 		.format(total_interologs)
 	sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
-
-	# combine dataframes
-	columns += overlapping_names('Pair_1') + overlapping_names('Pair_2')
-	columns += ['Interface_Gap_Score_Pair_1', 'Interface_Gap_Score_Pair_2']
-	values = pd.DataFrame(values, columns = columns)
-	values = values.round(3)
-	interologs = pd.read_csv(interologs_file, sep=',')
-	interologs = pd.concat([interologs, values], axis = 1)
-	interologs = move_col_to_end(interologs, 'Database')
-	interologs = move_col_to_end(interologs, 'Label')
-
-	# write interologs
-	if out_file == '':
-		out_file = interologs_file
-	interologs.to_csv(out_file, sep=',', index=False)
+	print '> Interface site cache:\t %s' % interface_sites.stats()
 
 	return out_file
 
 
+def print_progress(i, total_interologs):
+	progress = 100*float(i)/total_interologs
+	message = 'Adding Interface Information \t\t%d%%\t%d/%d' %                \
+		(progress, i, total_interologs)
+	sys.stdout.write('\r' + message); sys.stdout.flush()
+
+
+# interface information of interolog (A1, A2 interact, B1, B2 orthologs)
+def interface_information(A1, A2, B1, B2, interface_sites,
+	global_alignments, special_sites, domains, functions):
+
+	indices1, indices2, db = interface_sites[(A1, A2)]
+	
+	global_alns1 = global_alignments[(A1, B1)]
+	global_alns2 = global_alignments[(A2, B2)]
+
+	diff1 = get_site_differences(A1, B1, indices1, global_alns1, functions)
+	diff2 = get_site_differences(A2, B2, indices2, global_alns2, functions)
+	gap_score1 = gap_pattern_score(indices1, global_alns1)
+	gap_score2 = gap_pattern_score(indices2, global_alns2)
+
+	value_pair_1 = diff1 + [len(indices1)]
+	value = value_pair_1 + diff2 + [len(indices2), db]
+
+	overlaps1 = overlapping_interface(A1, special_sites, domains, indices1)
+	overlaps2 = overlapping_interface(A2, special_sites, domains, indices2)
+
+	value += overlaps1 + overlaps2 + [gap_score1, gap_score2]
+	return value
+
+
+"""
+interface information of rows (A1, A2, B1, B2) split across pool processes,
+returns values in the same order as rows
+rows are grouped into tasks of about equal number of interface residues,
+start is the number of interologs before rows (for progress messages)
+"""
+def parallel_interface_information(rows, pool, jobs, start, total_interologs):
+	values = [None] * len(rows)
+	done = start
+	tasks = balanced_tasks(rows, jobs * 4)
+	interface_sites = shared['interface_sites']
+	for results, hits, misses in pool.imap_unordered(
+		interface_information_task, tasks):
+		for position, value in results:
+			values[position] = value
+		# each process has its own copy of the site cache
+		interface_sites.add_counts(hits, misses)
+		done += len(results)
+		print_progress(done, total_interologs)
+	return values
+
+"""
+run in pool processes, task is a list of (position, (A1, A2, B1, B2))
+returns list of (position, values) and site cache hits and misses of task
+"""
+def interface_information_task(task):
+	interface_sites = shared['interface_sites']
+	hits, misses = interface_sites.hits, interface_sites.misses
+	results = [
+		(position, interface_information(*row + [interface_sites,
+			shared['global_alignments'], shared['special_sites'],
+			shared['domains'], shared['functions']]))
+		for position, row in task
+	]
+	return results, interface_sites.hits - hits,                              \
+		interface_sites.misses - misses
+
+"""
+split rows into num_tasks lists of (position, row) with similar total sizes
+sizes are estimated from the unparsed interface residues, which are parsed
+in the pool processes
+"""
+def balanced_tasks(rows, num_tasks):
+	interface_indices = shared['interface_indices']
+	sizes = []
+	for A1, A2, B1, B2 in rows:
+		indices1, indices2, db = interface_entry(interface_indices, A1, A2)
+		sizes.append(text_length(indices1) + text_length(indices2) + 1)
+	# largest rows first, each to the task with the least residues so far
+	tasks = [[] for task in range(num_tasks)]
+	loads = [(0, task) for task in range(num_tasks)]
+	for position in sorted(range(len(rows)), key = lambda k: -sizes[k]):
+		load, task = heapq.heappop(loads)
+		tasks[task].append((position, rows[position]))
+		heapq.heappush(loads, (load + sizes[position], task))
+	return [task for task in tasks if task != []]
+
+# missing interface residues are read as NaN
+def text_length(value):
+	if isinstance(value, str):
+		return len(value)
+	return 0
+
+
 # Default Interface Resdues Comparision Information
 def default_interface_compare_categories():
 	# get counts, blosum scores, molecule, and secondary structure information
@@ -105,16 +229,20 @@ def default_interface_compare_categories():
 # filter interologs that are in the interfaces file
 def filter_interologs(interologs_file, interfaces_file1, out_file=''):
 	interface_indices = interface_indices_as_dict(interfaces_file1)
-	interologs = pd.read_csv(interologs_file, sep=',')
-	A1_Values, A2_Values = interologs['A1'], interologs['A2']
-	filtered = []
-	for A1, A2, values in zip(A1_Values, A2_Values, interologs.values):
-		if (A1, A2) in interface_indices:
-			filtered.append(values)
-	filtered = pd.DataFrame(filtered, columns = interologs.columns.values)
 	if out_file == '':
 		out_file = interologs_file
-	filtered.to_csv(out_file, sep=',', index=False)
+	# write to temporary file, out_file can be the file being read
+	temp_file = out_file + '.tmp'
+	with open(temp_file, 'w') as writer:
+		chunks = read_chunks(interologs_file, chunk_size)
+		for k, interologs in enumerate(chunks):
+			# pairs of proteins are stored in one order
+			in_interfaces = pairs_in_dict(interologs['A1'], interologs['A2'],
+				interface_indices) | pairs_in_dict(interologs['A2'],
+				interologs['A1'], interface_indices)
+			interologs[in_interfaces].to_csv(writer, sep=',', index=False,
+				header = (k == 0))
+	os.rename(temp_file, out_file)
 
 
 # if proteins for 1st and 2nd organism interact, label 1, else 0 for only 1st
@@ -125,7 +253,7 @@ def label_interologs(orthologs_file, interactome_fileA, interactome_fileB,
 
 	# read input files
 	orthologs = pd.read_csv(orthologs_file, sep = ',')
-	interactomeA = interactome_as_dict(interactome_fileA)
+	interactomeA = interactome_edges(interactome_fileA)
 	interactomeB = interactome_as_dict(interactome_fileB)
 
 	# double columns for each pair of orthologs
@@ -134,46 +262,73 @@ def label_interologs(orthologs_file, interactome_fileA, interactome_fileB,
 	columns = double_columns(columns)
 	columns = ['A1', 'B1', 'A2', 'B2'] + columns + ['Label']
 
-	# get columns to iterate over
-	total = len(orthologs.values)
-	values = orthologs.drop(columns = ['A', 'B'], axis = 1)
-	orthologs = zip(orthologs.A, orthologs.B, values.values)
-
-	# loop through possible interolog combinations
-	interologs = []
-	for i, (a1, b1, values1) in enumerate(orthologs):
-		for j, (a2, b2, values2) in enumerate(orthologs):
-			if i > j:
-				if (a1, a2) in interactomeA:
-					
-					# concatenate interolog pair information
-					values_list1 = np.ndarray.tolist(values1)
-					values_list2 = np.ndarray.tolist(values2)
-					interolog = [a1, b1, a2, b2] + values_list1 + values_list2
-					
-					# add interaction label
-					if (b1, b2) in interactomeB:
-						interolog.append(1)
-					else:
-						interolog.append(0)
-
-					interologs.append(interolog)
-
-	# write interologs and return file name
-	interologs = pd.DataFrame(interologs, columns = columns)
+	proteinsA, proteinsB = orthologs.A.values, orthologs.B.values
+	values = orthologs.drop(columns = ['A', 'B'], axis = 1).values
+	# column types are decided once so every chunk is written the same way
+	types = pd.DataFrame(values).infer_objects().dtypes.tolist()
+	types = dict(zip(columns[4:-1], types + types))
+
 	default_file_name = orthologs_file.replace('Orthologs', 'Interologs')
 	if file_name == '': file_name = default_file_name
 
-	interologs.to_csv(file_name, sep = ',', index = False)
+	# interolog pairs i, j of ortholog rows where i > j and (A1, A2) interact
+	total, positive = 0, 0
+	with open(file_name, 'w') as writer:
+		pd.DataFrame(columns = columns).to_csv(writer, sep = ',',
+			index = False)
+		for i, j in interolog_indices(orthologs.A, interactomeA,
+			chunk_size):
+
+			# concatenate interolog pair information
+			interologs = pd.DataFrame(np.hstack([values[i], values[j]]),
+				columns = columns[4:-1]).astype(types)
+			for k, (name, proteins) in enumerate([('A1', proteinsA[i]),
+				('B1', proteinsB[i]), ('A2', proteinsA[j]),
+				('B2', proteinsB[j])]):
+				interologs.insert(k, name, proteins)
+
+			# add interaction label
+			interologs['Label'] = pairs_in_dict(proteinsB[i], proteinsB[j],
+				interactomeB).astype(int)
+
+			interologs.to_csv(writer, sep = ',', index = False,
+				header = False)
+			total += len(interologs)
+			positive += interologs['Label'].sum()
 
 	sys.stdout.write('\rLabeled Interologs \n'); sys.stdout.flush()
-	print '> Total:\t %d' % len(interologs)
-	print '> Positive:\t %d' % len(interologs[interologs['Label'] == 1])
-	print '> Unlabeled:\t %d' % len(interologs[interologs['Label'] == 0])
+	print '> Total:\t %d' % total
+	print '> Positive:\t %d' % positive
+	print '> Unlabeled:\t %d' % (total - positive)
 
 	return file_name
 
 
+"""
+join ortholog rows on interactions of the first organism instead of checking
+every pair of rows, yields chunks of row indices i, j of interologs in the
+order of looping over i, then j < i
+"""
+def interolog_indices(proteinsA, interactome_edges, size):
+	rows = pd.DataFrame({'A1': proteinsA.values,
+		'i': np.arange(len(proteinsA))})
+	partners = rows.rename(columns = {'A1': 'A2', 'i': 'j'})
+	# blocks of rows i so pairs of only one block are in memory
+	for start in range(0, len(rows), size):
+		pairs = rows[start:start + size].merge(interactome_edges, on = 'A1')
+		pairs = pairs.merge(partners, on = 'A2')
+		pairs = pairs[pairs.j < pairs.i].sort_values(['i', 'j'])
+		i, j = pairs.i.values, pairs.j.values
+		for k in range(0, len(i), size):
+			yield i[k:k + size], j[k:k + size]
+
+
+# parsed interface residues (ResidueSets) of A1 and A2 and database
+def parse_interface(interface_indices, A1, A2):
+	indices1, indices2, db = interface_entry(interface_indices, A1, A2)
+	return ResidueSet.parse(indices1), ResidueSet.parse(indices2), db
+
+
 def overlapping_names(suffix):
 	names = [
 		'Interface_Overlapping_Special-Sites_Count_' + suffix,
@@ -183,23 +338,11 @@ def overlapping_names(suffix):
 
 # number of same interface indices with special sites and domain indices
 def overlapping_interface(A, special_sites, domains, interface_indices):
-	if A in special_sites:
-		if special_sites[A] == None:
-			special_sites_indices = []
-		else:
-			special_sites_indices = parse_zipped_indices(special_sites[A])
-	else:
-		special_sites_indices = []
-
-	if A in domains:
-		start, end = domains[A]
-		domain_indices = decrement_indices(unzip_start_end(start, end))
-	else:
-		domain_indices = []
-	
+	special_sites_indices = special_sites.get(A, ResidueSet())
+	domain_indices = domains.get(A, ResidueSet())
 	values = [
-		num_overlapping(special_sites_indices, interface_indices),
-		num_overlapping(domain_indices, interface_indices)
+		special_sites_indices.intersection_count(interface_indices),
+		domain_indices.intersection_count(interface_indices)
 	]
 	return values
 
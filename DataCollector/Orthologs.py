@@ -1,11 +1,66 @@
 # Copyright © Garima Kapila
 
 import csv, pandas as pd, sys
+from AlignmentStore import alignment_store
 from DataParser import *
 from SequenceParser import *
 from ResidueComparator import *
 
 
+# number of global alignments held in memory at once
+chunk_size = 50000
+
+
+"""
+label orthologs with global alignment, special site and domain site features
+in one pass, each global alignment is read once (chunk_size at a time) and
+the orthologs file is written once
+columns are the same as label_orthologs_global_alignments,
+label_orthologs_special_sites and label_orthologs_pfam run in turn
+"""
+def label_orthologs(orthologs_file, global_alignments_file,
+	special_sites_file, pfam_file, file_name=''):
+
+	sys.stdout.write('\rLabeling Orthologs'); sys.stdout.flush()
+
+	# read input files
+	orthologs = add_blast_prefix(pd.read_csv(orthologs_file, sep = ','))
+	global_alignments = alignment_store(global_alignments_file)
+	special_sites = special_sites_as_dict(special_sites_file)
+	domains = domain_sites_dict(pfam_file)
+
+	global_names, global_functions = default_global_compare_categories()
+	sites_names, sites_functions = default_special_sites_compare_categories()
+	domain_names, domain_functions = default_domain_compare_categories()
+
+	pairs = zip(orthologs['A'], orthologs['B'])
+	results = []
+	for start in range(0, len(pairs), chunk_size):
+		chunk = pairs[start:start + chunk_size]
+		alignments = [global_alignments[pair] for pair in chunk]
+		values = zip(
+			global_alignment_values(alignments, global_functions),
+			site_values(chunk, alignments, special_sites, sites_functions),
+			site_values(chunk, alignments, domains, domain_functions))
+		results += [global_value + sites_value + domain_value
+			for global_value, sites_value, domain_value in values]
+
+	# combine ortholog values with result values
+	columns = ['Global_Score', 'Global_Length'] + global_names +              \
+		sites_names + ['Special-Sites_Length'] + domain_names +               \
+		['Domain_Length']
+	results = pd.DataFrame(results, columns = columns)
+	orthologs = pd.concat([orthologs, results], axis = 1)
+
+	# write orthologs into file and return file name
+	if file_name == '':
+		file_name = orthologs_file
+	orthologs.to_csv(file_name, sep = ',', index = False)
+	sys.stdout.write('\rLabeled Orthologs \n'); sys.stdout.flush()
+
+	return file_name
+
+
 
 # compare # residues that match or are gaps at domain sites
 def label_orthologs_pfam(pfam_file, orthologs_file,
@@ -15,23 +70,16 @@ def label_orthologs_pfam(pfam_file, orthologs_file,
 	# read input files
 	orthologs = pd.read_csv(orthologs_file, sep = ',')
 	domains = domain_sites_dict(pfam_file)
-	global_alignments = global_alignments_as_dict(global_alignments_file)
+	global_alignments = alignment_store(global_alignments_file)
 
 	# get default information categories for comparing residues
 	if residue_compare_categories == ():
 		residue_compare_categories = default_domain_compare_categories()
 	names, functions = residue_compare_categories
 
-	results = []
-	for A, B in zip(orthologs['A'], orthologs['B']):
-		global_alns = global_alignments[(A, B)]
-		if A in domains:
-			start, end = domains[A]
-			indices = decrement_indices(unzip_start_end(start, end))
-		else:
-			indices = []
-		info = get_site_differences(A, B, indices, global_alns, functions)
-		results.append(info + [len(indices)])
+	pairs = zip(orthologs['A'], orthologs['B'])
+	alignments = [global_alignments[pair] for pair in pairs]
+	results = site_values(pairs, alignments, domains, functions)
 
 	# combine global alignment values with result values
 	results = pd.DataFrame(results, columns = names + ['Domain_Length'])
@@ -55,27 +103,17 @@ def label_orthologs_special_sites(special_sites_file, orthologs_file,
 
 	# read input files
 	orthologs = pd.read_csv(orthologs_file, sep = ',')
-	global_alignments = pd.read_csv(global_alignments_file, sep = ',')
-	special_sites = zipped_special_sites_as_dict(special_sites_file)
-	global_alignments = global_alignments_as_dict(global_alignments_file)
+	special_sites = special_sites_as_dict(special_sites_file)
+	global_alignments = alignment_store(global_alignments_file)
 
 	# get default information categories for comparing residues
 	if residue_compare_categories == ():
 		residue_compare_categories = default_special_sites_compare_categories()
 	names, functions = residue_compare_categories
 
-	results = []
-	for A, B in zip(orthologs['A'], orthologs['B']):
-		global_alns = global_alignments[(A, B)]
-		if A in special_sites:
-			if special_sites[A] == None:
-				indices = []
-			else:
-				indices = parse_zipped_indices(special_sites[A])
-		else:
-			indices = []
-		info = get_site_differences(A, B, indices, global_alns, functions)
-		results.append(info + [len(indices)])
+	pairs = zip(orthologs['A'], orthologs['B'])
+	alignments = [global_alignments[pair] for pair in pairs]
+	results = site_values(pairs, alignments, special_sites, functions)
 
 	# combine global alignment values with result values
 	results = pd.DataFrame(results, columns = names + ['Special-Sites_Length'])
@@ -92,9 +130,9 @@ def label_orthologs_special_sites(special_sites_file, orthologs_file,
 
 
 """
-compare and get # residues that match or are gaps in global alignment
-precondition: each row in global_alignments and orthologs_file correspond
-to the same set of proteins
+compare and get # residues that match or are gaps in global alignment of
+each pair of orthologs, alignments are read from the alignment store in
+chunks of chunk_size so they are never all in memory
 """
 def label_orthologs_global_alignments(global_alignments_file,
 	orthologs_file, file_name='', residue_compare_categories=()):
@@ -102,38 +140,25 @@ def label_orthologs_global_alignments(global_alignments_file,
 	sys.stdout.write('\rLabeling Global Alignments'); sys.stdout.flush()
 
 	# read input files
-	global_alignments = pd.read_csv(global_alignments_file, sep = ',')
-	columns = list(global_alignments.columns.values)
-	exceptions = ['A', 'B', 'Fasta_Length_A', 'Fasta_Length_B']
-	columns = add_prefix(columns, 'Global', exceptions=exceptions)
-	global_alignments.columns = columns
-
-	orthologs = pd.read_csv(orthologs_file, sep = ',')
-	columns = list(orthologs.columns.values)
-	columns = add_prefix(columns, 'Blast', exceptions=exceptions)
-	orthologs.columns = columns
+	global_alignments = alignment_store(global_alignments_file)
+	orthologs = add_blast_prefix(pd.read_csv(orthologs_file, sep = ','))
 
 	# get default information categories for comparing residues
 	if residue_compare_categories == ():
 		residue_compare_categories = default_global_compare_categories()
 	names, functions = residue_compare_categories
 
+	pairs = zip(orthologs['A'], orthologs['B'])
 	results = []
-	for row in global_alignments.values:
-		protA, protB, alignment1, alignment2, score, length = row
-		info = get_differences(alignment1, alignment2, functions)
-		results.append(info)
-	results = pd.DataFrame(results, columns = names)
-	results.round(3)
-
-	# remove global alignment sequences
-	global_alignments.drop('Global_Alignment1', axis = 1, inplace = True)
-	global_alignments.drop('Global_Alignment2', axis = 1, inplace = True)
+	for start in range(0, len(pairs), chunk_size):
+		alignments = [global_alignments[pair] for pair in
+			pairs[start:start + chunk_size]]
+		results += global_alignment_values(alignments, functions)
 
 	# combine global alignment values with result values
-	global_alignments = pd.concat([global_alignments, results], axis = 1)
-	global_alignments.drop(columns = ['A', 'B'], axis = 1, inplace = True)
-	orthologs = pd.concat([orthologs, global_alignments], axis = 1)
+	results = pd.DataFrame(results,
+		columns = ['Global_Score', 'Global_Length'] + names)
+	orthologs = pd.concat([orthologs, results], axis = 1)
 
 	# write global alignments into file and return file name
 	if file_name == '':
@@ -144,14 +169,45 @@ def label_orthologs_global_alignments(global_alignments_file,
 	return file_name
 
 
+# score, length and differences in each global alignment (AlignmentStore)
+def global_alignment_values(alignments, functions):
+	differences = get_batch_differences([(alignment['alnA'],
+		alignment['alnB']) for alignment in alignments], functions)
+	return [[alignment['score'], alignment['length']] + difference
+		for alignment, difference in zip(alignments, differences)]
+
+"""
+differences at sites of protein A (dictionary of ResidueSets) in global
+alignment of each pair (A, B), followed by the number of sites
+"""
+def site_values(pairs, alignments, sites, functions):
+	residues, lengths = [], []
+	for (A, B), alignment in zip(pairs, alignments):
+		indices = sites.get(A, ResidueSet())
+		residues.append(get_site_residues(A, indices, alignment))
+		lengths.append(len(indices))
+	return [difference + [length] for difference, length in
+		zip(get_batch_differences(residues, functions), lengths)]
+
+# 'Blast_' prefix for ortholog columns from BLAST, except proteins and lengths
+def add_blast_prefix(orthologs):
+	exceptions = ['A', 'B', 'Fasta_Length_A', 'Fasta_Length_B']
+	orthologs.columns = add_prefix(list(orthologs.columns.values), 'Blast',
+		exceptions=exceptions)
+	return orthologs
+
+
 """
 input protType 'A' or 'B' in blast file, the blast file, and corresponding
 fasta file of protType protein
 ex. calculate_coverage('A', blast, 'HomoSapiens.fasta') where 'A' represents
 Homo Sapiens protein
+If interactome_file1 and interfaces_file1 are given, only orthologs that can
+be part of an interolog with interface residues are kept (see
+interolog_orthologs), so the others are not aligned or labeled
 """
 def get_orthologs(blast_file, fasta_file1, fasta_file2, orthologs_file='',
-	threshold=0.5):
+	threshold=0.5, interactome_file1='', interfaces_file1=''):
 	
 	# print progress message
 	sys.stdout.write('\rFiltering Orthologs'); sys.stdout.flush()
@@ -163,6 +219,10 @@ def get_orthologs(blast_file, fasta_file1, fasta_file2, orthologs_file='',
 	# calculate sequence coverages in blast alignment sequence
 	orthologs = calculate_coverage('A', blast, fasta_file1, threshold)
 	orthologs = calculate_coverage('B', orthologs, fasta_file2, threshold)
+	total_orthologs = len(orthologs.index)
+	if interactome_file1 != '' and interfaces_file1 != '':
+		orthologs = orthologs[interolog_orthologs(orthologs,
+			interactome_file1, interfaces_file1)]
 
 	# if orthologs_file not specified, use default file to write results in
 	if orthologs_file == '':
@@ -172,6 +232,8 @@ def get_orthologs(blast_file, fasta_file1, fasta_file2, orthologs_file='',
 	# print progress message
 	numProts = len(orthologs.index)
 	message = 'Filtered Orthologs: %d pairs' % numProts
+	if numProts != total_orthologs:
+		message += ' (of %d) that can form interologs' % total_orthologs
 	sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
 
 	# write and return orthologs_file
@@ -182,6 +244,20 @@ def get_orthologs(blast_file, fasta_file1, fasta_file2, orthologs_file='',
 
 ### Helper functions ###
 
+"""
+whether each ortholog (row of A, B) can be in an interolog that keeps its
+interface residues: A interacts with a protein that also has an ortholog
+(label_interologs) and the pair has interface residues (filter_interologs)
+"""
+def interolog_orthologs(orthologs, interactome_file1, interfaces_file1):
+	edges = interactome_edges(interactome_file1)
+	interface_indices = interface_indices_as_dict(interfaces_file1)
+	edges = edges[edges.A1.isin(orthologs.A) & edges.A2.isin(orthologs.A)]
+	# pairs of proteins are stored in one order
+	in_interfaces = pairs_in_dict(edges.A1, edges.A2, interface_indices) |    \
+		pairs_in_dict(edges.A2, edges.A1, interface_indices)
+	return orthologs.A.isin(edges.A1[in_interfaces]).values
+
 # Default Domain Information: counts and blosum scores
 def default_domain_compare_categories():
 	categories = [
@@ -220,8 +296,8 @@ def calculate_coverage(protType, blast, fasta_file, threshold):
 	blast.is_copy = False
 	# add column of protein sequence lengths from fasta file
 	seq_length_col = 'Fasta_Length_' + protType
-	fasta = fasta_as_dict(fasta_file)
-	blast[seq_length_col] = blast[protType].apply(lambda prot: len(fasta[prot]))
+	fasta = fasta_store(fasta_file)
+	blast[seq_length_col] = blast[protType].apply(fasta.length)
 	# columns from blast file needed to calculate coverage
 	cols = [col + protType for col in ['Start_', 'End_']]
 	cols.append(seq_length_col)
@@ -0,0 +1,142 @@
+# Copyright © Garima Kapila
+
+import numpy as np
+
+
+"""
+Set of residue indices stored as sorted, disjoint intervals instead of a list
+of every index, ex. interface residues '[1-5,8]' are kept as 2 intervals
+Indices are 0-based (decremented) and intervals are half-open [start, end)
+ex. usage:
+interface = ResidueSet.parse('[1-5,8]')           # 0, 1, 2, 3, 4, 7
+domain = ResidueSet.from_intervals([3], [9])      # 2, 3, ..., 8
+interface.intersection_count(domain)              # 4
+"""
+class ResidueSet():
+
+	def __init__(self, starts=[], ends=[]):
+		self.starts, self.ends = normalize(starts, ends)
+
+	"""
+	parse indices string from Interactome INSIDER, indices are 1-based
+	ex. ResidueSet.parse('[1 ,2,8,7,3 ,4, 5-8]') has indices 0 to 7
+	"""
+	@staticmethod
+	def parse(zipped_indices):
+		entries = zipped_indices.strip('[]').replace(' ', '').split(',')
+		starts, ends = [], []
+		for entry in entries:
+			index_range = entry.split('-')
+			if len(index_range) == 2 and index_range[0].isdigit() and        \
+				index_range[1].isdigit():
+				start, end = int(index_range[0]), int(index_range[1])
+			elif entry != '':
+				start, end = int(entry), int(entry)
+			else:
+				continue
+			starts.append(start - 1)
+			ends.append(end)
+		return ResidueSet(starts, ends)
+
+	# 1-based inclusive intervals like UniProt and Pfam, ex. ([1, 8], [5, 8])
+	@staticmethod
+	def from_intervals(starts, ends):
+		return ResidueSet(np.asarray(starts, dtype = np.int64) - 1, ends)
+
+
+
+	def __len__(self):
+		return int((self.ends - self.starts).sum())
+
+	# indices in increasing order, without building a list
+	def __iter__(self):
+		for start, end in zip(self.starts.tolist(), self.ends.tolist()):
+			for index in xrange(start, end):
+				yield index
+
+	def __contains__(self, index):
+		k = np.searchsorted(self.starts, index, side = 'right') - 1
+		return k >= 0 and index < self.ends[k]
+
+	def __eq__(self, other):
+		return isinstance(other, ResidueSet) and                              \
+			np.array_equal(self.starts, other.starts) and                     \
+			np.array_equal(self.ends, other.ends)
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __or__(self, other):
+		return self.union(other)
+
+	def __repr__(self):
+		return 'ResidueSet(%s)' % self.zipped()
+
+
+
+	def union(self, other):
+		return ResidueSet(np.concatenate([self.starts, other.starts]),
+			np.concatenate([self.ends, other.ends]))
+
+	# number of indices in both sets
+	def intersection_count(self, other):
+		if len(self.starts) == 0 or len(other.starts) == 0:
+			return 0
+		covered_ends = other.count_below(self.ends)
+		covered_starts = other.count_below(self.starts)
+		return int((covered_ends - covered_starts).sum())
+
+	# add offset to every index
+	def shift(self, offset):
+		return ResidueSet(self.starts + offset, self.ends + offset)
+
+	# numpy array of indices, ex. for indexing an array of residues
+	def indices(self):
+		lengths = self.ends - self.starts
+		if len(lengths) == 0:
+			return np.zeros(0, dtype = np.int64)
+		first = np.cumsum(lengths) - lengths
+		return np.arange(lengths.sum()) + np.repeat(self.starts - first,
+			lengths)
+
+	# back to 1-based string format, ex. '[1-5,8]'
+	def zipped(self):
+		entries = [
+			str(start + 1) if end - start == 1
+			else '%d-%d' % (start + 1, end)
+			for start, end in zip(self.starts.tolist(), self.ends.tolist())
+		]
+		return '[' + ','.join(entries) + ']'
+
+
+
+	##################
+	# Helper methods #
+	##################
+
+	# number of indices in set that are less than each value in values
+	def count_below(self, values):
+		lengths = self.ends - self.starts
+		before = np.concatenate([[0], np.cumsum(lengths)])
+		# last interval starting at or before value
+		k = np.searchsorted(self.starts, values, side = 'right')
+		last = np.maximum(k - 1, 0)
+		partial = np.minimum(values, self.ends[last]) - self.starts[last]
+		return np.where(k > 0, before[last] + partial, 0)
+
+
+
+# sort intervals and merge the ones that overlap or touch
+def normalize(starts, ends):
+	starts = np.asarray(starts, dtype = np.int64).ravel()
+	ends = np.asarray(ends, dtype = np.int64).ravel()
+	keep = ends > starts
+	starts, ends = starts[keep], ends[keep]
+	if len(starts) < 2:
+		return starts, ends
+	order = np.argsort(starts, kind = 'mergesort')
+	starts, ends = starts[order], ends[order]
+	# an interval starts a new group if it begins after all previous ends
+	previous_end = np.maximum.accumulate(ends)[:-1]
+	groups = np.flatnonzero(np.concatenate([[True], starts[1:] > previous_end]))
+	return starts[groups], np.maximum.reduceat(ends, groups)
@@ -1,7 +1,9 @@
 # Copyright © Garima Kapila
 
 from DataParser import *
-import time
+from FeatureKernel import feature_kernel
+from ResidueSet import ResidueSet
+import numpy as np, time
 
 
 ### Compare sequences ###
@@ -27,19 +29,15 @@ def get_names_and_functions(categories, name_prefix=''):
 """
 Get differences between global alignment sequences
 functions is a list of functions that each take in 2 residues as arguments
-returns combined list of differences from those functions
+returns combined list of differences from those functions, looked up from
+a table of the function values for every pair of residues (FeatureKernel.py)
 """
 def get_differences(sequence1, sequence2, functions):
-	# intialize differences as 0
-	length = len(flatten([func('A', 'A') for func in functions]))
-	results = [0] * length
-	# get differences for each pair of residues in sequences
-	for residue_pair in zip(sequence1, sequence2):
-		# update counts in results
-		comparisons = flatten([func(*residue_pair) for func in functions])
-		results = add_lists(results, comparisons)
+	return feature_kernel(functions).differences(sequence1, sequence2)
 
-	return results
+# get_differences for each (sequence1, sequence2) in sequence_pairs at once
+def get_batch_differences(sequence_pairs, functions):
+	return feature_kernel(functions).batch_differences(sequence_pairs)
 
 
 
@@ -52,42 +50,66 @@ def num_identical(seq1, seq2):
 ### Get interface residues ###
 
 """
-increment values of a list from start_index to end_index inclusive
-ex. shift_gap_indices('--A-B--CDE-', [1, 2, 3, 4, 5]) = [3, 5, 8, 9, 10]
+position in aligned sequence of each residue of the ungapped sequence, built
+once per alignment so residues at any indices are gathered with one lookup
+ex. gapped_positions('--A-B--CDE-') = [2, 4, 7, 8, 9]
 """
-def shift_gap_indices(sequence, unzipped_indices):
-	for sequence_index, residue in enumerate(sequence):
-		if residue == '-':
-			unzipped_indices = [
-				index + 1 if index > sequence_index
-				else index
-				for index in unzipped_indices
-			]
-	return unzipped_indices
+def gapped_positions(sequence):
+	return np.flatnonzero(np.frombuffer(sequence, dtype = 'S1') != '-')
+
+"""
+positions in aligned sequence of residues at indices (ResidueSet or list,
+decremented) of the ungapped sequence, indices past its end are left out
+ex. shift_gap_indices('--A-B--CDE-', [0, 1, 2, 3, 4, 9]) = [2, 4, 7, 8, 9]
+"""
+def shift_gap_indices(sequence, indices, positions=None):
+	if positions is None:
+		positions = gapped_positions(sequence)
+	indices = index_array(indices)
+	return positions[indices[(indices >= 0) & (indices < len(positions))]]
+
+# numpy array of indices in a ResidueSet or list
+def index_array(indices):
+	if isinstance(indices, ResidueSet):
+		return indices.indices()
+	return np.asarray(list(indices), dtype = np.int64)
+
+# characters of string at positions (numpy array)
+def gather_characters(string, positions):
+	return np.frombuffer(string, dtype = 'S1')[positions].tostring()
 
 
 # precondition: Indices are unzipped and decremented
 # Difference between protein A and B at specified indices
 def get_site_differences(A, B, indices, global_alignments, functions):
-	seqA, seqB = global_alignments['alnA'], global_alignments['alnB']
-	residuesA, residuesB = extract_residues(seqA, seqB, indices, A)
+	residuesA, residuesB = get_site_residues(A, indices, global_alignments)
 	differences = get_differences(residuesA, residuesB, functions)
 	return differences
 
+# residues of protein A and B at specified indices, global_alignments can
+# have the gapped positions of A (from AlignmentStore) as 'positionsA'
+def get_site_residues(A, indices, global_alignments):
+	seqA, seqB = global_alignments['alnA'], global_alignments['alnB']
+	return extract_residues(seqA, seqB, indices, A,
+		global_alignments.get('positionsA'))
+
 
 """
 extract residues from global alignments
-use sequenceA to shift indices with gaps, extract residues from sequenceA
-and sequenceB at those indices
+indices of the ungapped sequenceA are mapped to positions in the alignment
+(see gapped_positions), residues of sequenceA and sequenceB at those
+positions are gathered at once
 """
-def extract_residues(sequenceA, sequenceB, indices, protein):
-	indices = shift_gap_indices(sequenceA, indices)
-	new_indices = [i for i in indices if i < len(sequenceA)]
-	if indices != new_indices:
+def extract_residues(sequenceA, sequenceB, indices, protein, positions=None):
+	if positions is None:
+		positions = gapped_positions(sequenceA)
+	indices = index_array(indices)
+	positions = shift_gap_indices(sequenceA, indices, positions)
+	if len(positions) != len(indices):
 		print '\rInvalid residue indices for %s, using a valid subset'        \
 			' instead' % protein
-	residuesA = extract_characters(sequenceA, new_indices)
-	residuesB = extract_characters(sequenceB, new_indices)
+	residuesA = gather_characters(sequenceA, positions)
+	residuesB = gather_characters(sequenceB, positions)
 	return residuesA, residuesB
 
 
@@ -96,18 +118,26 @@ def set_gap_dict(gap_dict):
 	gap_pattern_dict = gap_dict
 
 
-# indices are decremented
+"""
+sum of how often residue of B is found between the residues of A left and
+right of a gap of A (see gap_pattern_as_dict), for the gap column right after
+the residue of A at each index (decremented)
+indices are mapped to alignment columns through the gapped positions of A
+('positionsA' from AlignmentStore) and all columns are gathered at once
+"""
 def gap_pattern_score(indices, global_alignments):
 	seqA, seqB = global_alignments['alnA'], global_alignments['alnB']
-	score = 0
-	for i in indices:
-		if i > 0 and i < len(seqA) - 1:
-			resA_left = seqA[i - 1]
-			resA = seqA[i]
-			resA_right = seqA[i + 1]
-			resB = seqB[i]
-			if resA == '-' and (resA_left and resA_right) in gap_pattern_dict:
-				score += gap_pattern_dict[(resA_left, resA_right)][resB]
+	positions = global_alignments.get('positionsA')
+	columns = shift_gap_indices(seqA, indices, positions) + 1
+	columns = columns[columns < len(seqA) - 1]
+	residuesA = np.frombuffer(seqA, dtype = 'S1')
+	columns = columns[residuesA[columns] == '-']
+	score = 0.0
+	for resA_left, resA_right, resB in zip(
+		gather_characters(seqA, columns - 1),
+		gather_characters(seqA, columns + 1),
+		gather_characters(seqB, columns)):
+		score += gap_pattern_dict.get((resA_left, resA_right), {}).get(resB, 0)
 	return score
 
 
@@ -0,0 +1,48 @@
+# Copyright © Garima Kapila
+
+from collections import OrderedDict
+
+
+"""
+Least recently used cache of parsed sites, so residues of a protein (or pair
+of proteins for interfaces) that appear in many interologs are only parsed
+once while they are in use
+parse is a function of key that returns the parsed sites
+ex. usage:
+interface_sites = SiteCache(lambda pair: parse_interface(pair), 100000)
+indices1, indices2, database = interface_sites[('P12345', 'Q67890')]
+"""
+class SiteCache():
+
+	def __init__(self, parse, max_size=100000):
+		self.parse = parse
+		self.max_size = max_size
+		self.entries = OrderedDict()
+		self.hits, self.misses = 0, 0
+
+	def __getitem__(self, key):
+		if key in self.entries:
+			self.hits += 1
+			# move to end as most recently used
+			value = self.entries.pop(key)
+		else:
+			self.misses += 1
+			value = self.parse(key)
+			if len(self.entries) >= self.max_size:
+				self.entries.popitem(last = False)
+		self.entries[key] = value
+		return value
+
+	def __len__(self):
+		return len(self.entries)
+
+	# add counts from a copy of this cache (ex. in another process)
+	def add_counts(self, hits, misses):
+		self.hits += hits
+		self.misses += misses
+
+	# ex. '95.2% hits (1000 hits, 50 misses)'
+	def stats(self):
+		total = max(self.hits + self.misses, 1)
+		return '%.1f%% hits (%d hits, %d misses)' %                           \
+			(100 * float(self.hits) / total, self.hits, self.misses)
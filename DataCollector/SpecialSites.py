@@ -0,0 +1,134 @@
+# Copyright © Garima Kapila
+
+import numpy as np
+
+
+"""
+Special sites (ex. active site, binding site) of each protein as sorted
+intervals instead of strings like '[1-5,8]', saved in a numpy .npz file so
+they load without parsing
+Intervals are 1-based and inclusive like UniProt, ex. (1, 5) and (8, 8)
+File arrays:
+proteins, categories        names
+offsets                     intervals of protein p, category c are
+                            starts/ends[offsets[p*C + c]:offsets[p*C + c + 1]]
+starts, ends                intervals of every protein and category
+combined_offsets            merged intervals across all categories of
+                            protein p are combined_starts/combined_ends
+                            [combined_offsets[p]:combined_offsets[p + 1]]
+"""
+
+
+"""
+parse rows of UniProt tab format, header is 'Entry' and a column per
+category, each cell is a list of features, ex. 'BINDING 12 12 ATP.; ...'
+returns categories and dictionary of protein: list of (starts, ends) arrays,
+one per category
+"""
+def parse_special_sites(rows):
+	rows = iter(rows)
+	categories = next(rows)[1:]
+	sites = {}
+	for row in rows:
+		if len(row) == 0:
+			continue
+		sites[row[0]] = [parse_intervals(cell) for cell in row[1:]]
+	return categories, sites
+
+# ex. 'METAL 5 5 Zinc.; METAL 9 12 Zinc.' returns [5, 9], [5, 12]
+def parse_intervals(cell):
+	tokens = cell.split(' ')
+	starts, ends = [], []
+	k = 0
+	while k < len(tokens) - 1:
+		if tokens[k].isdigit():
+			k += 1
+			if tokens[k].isdigit():
+				starts.append(int(tokens[k - 1]))
+				ends.append(int(tokens[k]))
+		k += 1
+	return sort_intervals(starts, ends)
+
+def sort_intervals(starts, ends):
+	starts, ends = np.array(starts, dtype = np.int32), \
+		np.array(ends, dtype = np.int32)
+	order = np.lexsort((ends, starts))
+	return starts[order], ends[order]
+
+# merge overlapping and adjacent intervals, ex. [1, 3, 4], [5, 3, 8] -> [1], [8]
+def merge_intervals(starts, ends):
+	starts, ends = sort_intervals(starts, ends)
+	if len(starts) == 0:
+		return starts, ends
+	# an interval starts a new group if it begins after all previous ends
+	previous_end = np.maximum.accumulate(ends)[:-1]
+	new_group = np.concatenate([[True], starts[1:] > previous_end + 1])
+	groups = np.flatnonzero(new_group)
+	merged_ends = np.maximum.reduceat(ends, groups)
+	return starts[groups], merged_ends
+
+
+
+### Read/write ###
+
+def write_special_sites(file, categories, sites):
+	proteins = sorted(sites.keys())
+	offsets, starts, ends = [0], [], []
+	combined_offsets, combined_starts, combined_ends = [0], [], []
+	for protein in proteins:
+		for protein_starts, protein_ends in sites[protein]:
+			starts.append(protein_starts)
+			ends.append(protein_ends)
+			offsets.append(offsets[-1] + len(protein_starts))
+		merged = merge_intervals(
+			np.concatenate([s for s, e in sites[protein]] + [[]]),
+			np.concatenate([e for s, e in sites[protein]] + [[]]))
+		combined_starts.append(merged[0])
+		combined_ends.append(merged[1])
+		combined_offsets.append(combined_offsets[-1] + len(merged[0]))
+
+	arrays = {
+		'proteins': np.array(proteins, dtype = str),
+		'categories': np.array(categories, dtype = str),
+		'offsets': np.array(offsets, dtype = np.int64),
+		'starts': concatenate_int32(starts),
+		'ends': concatenate_int32(ends),
+		'combined_offsets': np.array(combined_offsets, dtype = np.int64),
+		'combined_starts': concatenate_int32(combined_starts),
+		'combined_ends': concatenate_int32(combined_ends)
+	}
+	with open(file, 'wb') as f:
+		np.savez(f, **arrays)
+	return file
+
+"""
+returns dictionary of protein: (starts, ends) merged across categories, or
+of protein: {category: (starts, ends)} if by_category
+"""
+def read_special_sites(file, by_category=False):
+	data = np.load(file)
+	proteins = data['proteins']
+	if by_category:
+		categories = data['categories']
+		offsets, starts, ends = data['offsets'], data['starts'], data['ends']
+		num_categories = len(categories)
+		sites = {}
+		for p, protein in enumerate(proteins):
+			sites[protein] = {}
+			for c, category in enumerate(categories):
+				i, j = offsets[p * num_categories + c],                       \
+					offsets[p * num_categories + c + 1]
+				sites[protein][category] = starts[i:j], ends[i:j]
+		return sites
+	offsets = data['combined_offsets']
+	starts, ends = data['combined_starts'], data['combined_ends']
+	return dict(
+		(protein, (starts[offsets[p]:offsets[p + 1]],
+			ends[offsets[p]:offsets[p + 1]]))
+		for p, protein in enumerate(proteins)
+	)
+
+def concatenate_int32(arrays):
+	if len(arrays) == 0:
+		return np.zeros(0, dtype = np.int32)
+	return np.concatenate(arrays).astype(np.int32)
@@ -1,12 +1,14 @@
 # Copyright © Garima Kapila
 
-import matplotlib.pyplot as plt
-import pandas as pd, pptx, re, scipy, seaborn, StringIO
-seaborn.set(color_codes = True)
-seaborn.set_color_codes('pastel')
+import pandas as pd, re, scipy, StringIO
+
+# matplotlib, seaborn and python-pptx are slow to import, so they are only
+# loaded by load_graphing once something is drawn
+plt, seaborn, pptx = None, None, None
 
 
 def column_comparisions(dataframe0, dataframe1, file_name, p_values):
+	load_graphing()
 	graphs = []
 	p_values_dict = dict(zip(p_values['Column'], p_values['P-Value']))
 	for col in p_values['Column']:
@@ -20,6 +22,7 @@ def column_comparisions(dataframe0, dataframe1, file_name, p_values):
 	write_images_to_ppt(graphs, graph_file_name)
 
 def line_graph(data, title, x_axis, y_axis):
+	load_graphing()
 	label_plot(title, x_axis, y_axis)
 	plt.plot(data)
 	return graph_as_image()
@@ -30,7 +33,16 @@ def line_graph(data, title, x_axis, y_axis):
 # Helper Methods #
 ##################
 
+# import graphing libraries and set plot style on first use
+def load_graphing():
+	global plt, seaborn, pptx
+	if plt == None:
+		import matplotlib.pyplot as plt, pptx.util, seaborn
+		seaborn.set(color_codes = True)
+		seaborn.set_color_codes('pastel')
+
 def write_images_to_ppt(images, title, file=''):
+	load_graphing()
 	if file != '':
 		ppt = pptx.Presentation(file)
 		name = file
@@ -44,6 +56,7 @@ def write_images_to_ppt(images, title, file=''):
 	ppt.save(name)
 
 def graph_as_image(title = ''):
+	load_graphing()
 	if title != '':
 		plt.title(title.replace('_', ' '))
 	fig = plt.gcf()
@@ -53,6 +66,7 @@ def graph_as_image(title = ''):
 	return imgdata
 
 def label_plot(title, x_axis, y_axis):
+	load_graphing()
 	plt.clf()
 	plt.title(title)
 	plt.xlabel(x_axis)
@@ -63,6 +77,7 @@ Splits data1 into nbins # bins, plot against data2
 Plots boxplot-violin plot for 0, 1 for each bucket
 """
 def bin_graph(data1, data2, labels, nbins):
+	load_graphing()
 	bins, ranges = get_bins_and_ranges(data1, data2, labels, nbins)
 	split_bins = []
 	for sub_bin in bins:
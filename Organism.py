@@ -1,17 +1,16 @@
 # Copyright © Garima Kapila
 
-import bs4, lxml.html as html, urllib2
-
 
 """
 An organism is defined by its genus (taxonomic category), epithet (specific or 
 second name). Additionally, a strain/variation may be specified.
 ex. Genus: Saccharomyces, Epithet: Cerevisiae, Strain: S288C
 	Organism('Saccharomyces', 'Cerevisiae', 'S288C')
+The taxon ID is optional, organisms loaded from the Catalog have it
 """
 class Organism:
 
-	def __init__(self, genus, epithet, strain=''):
+	def __init__(self, genus, epithet, strain='', taxon_ID=None):
 
 		# format genus and epithet (ex. 'saccharomyces' -> 'Saccharomyces')
 		self.genus = genus[0].upper() + genus[1:].lower()
@@ -33,11 +32,15 @@ class Organism:
 		if self.name[-1] == '-':
 			self.name = self.name[:-1]
 
+		# NCBI taxonomy ID, ex. 559292
+		self.taxon_ID = taxon_ID
+
 	"""
 	returns True if there are existing proteins in the UniProt database that 
 	correspond to the organism's genus, epithet, strain; False otherwise
 	"""
 	def is_valid(self):
+		import bs4, lxml.html as html, urllib2
 
 		# url used for searching organism in UniProt database
 		url = 'http://www.uniprot.org/uniprot/?query=' +                      \
@@ -54,9 +57,11 @@ class Organism:
 		return exists
 
 	"""
-	todo, for now just hard-coded a few
+	taxon ID from the catalog, falls back to a few hard-coded ones
 	"""
 	def get_taxon_ID(self):
+		if self.taxon_ID != None:
+			return self.taxon_ID
 		IDs = {
 			'HS': 9606,
 			'SC': 559292, # Strain S288C
@@ -0,0 +1,159 @@
+# Copyright © Garima Kapila
+
+import os, random, sys
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from DataCollector.SpecialSites import sort_intervals, write_special_sites
+
+
+"""
+Synthetic transfer from Org-One to Org-Two, the files Collector has after
+BLAST: fasta files, BLAST hits, interactomes of both organisms, interface
+residues, special sites and Pfam domains of Org-One
+Proteins of Org-Two are mutated copies of the ones of Org-One (some with
+repeats), a third of them also hit the next protein
+ex. usage:
+write_transfer('Transfer')  # files in Transfer/, ex. Transfer/Org-One.fasta
+"""
+
+residues = 'ACDEFGHIKLMNPQRSTVWY'
+
+interactome_header = 'Uniprot_A\tUniprot_B\tGene_A\tGene_B\n'
+
+
+def write_transfer(directory, num_proteins=60, seed=7):
+	generator = random.Random(seed)
+	if not os.path.exists(directory):
+		os.makedirs(directory)
+	path = lambda name: os.path.join(directory, name)
+
+	proteins1 = ['PA%03d' % k for k in range(num_proteins)]
+	proteins2 = ['QB%03d' % k for k in range(num_proteins)]
+	sequences1, sequences2 = {}, {}
+	for protein1, protein2 in zip(proteins1, proteins2):
+		sequence = ''.join(generator.choice(residues)
+			for k in range(generator.randint(40, 200)))
+		if generator.random() < 0.2:
+			sequence = sequence[:20] * 3 + sequence
+		sequences1[protein1] = sequence
+		sequences2[protein2] = mutate(generator, sequence)
+	write_fasta(path('Org-One.fasta'), proteins1, sequences1)
+	write_fasta(path('Org-Two.fasta'), proteins2, sequences2)
+
+	with open(path('BlastP_Org-One_Org-Two.csv'), 'w') as f:
+		f.write('A,B,E-Value,Alignment_Length,Start_A,End_A,Start_B,End_B,'
+			'Bitscore,Identical_Count,Positive_Count,Mismatch_Count,Gap\n')
+		for k, protein1 in enumerate(proteins1):
+			hits = [proteins2[k]]
+			if k % 3 == 0:
+				hits.append(proteins2[(k + 1) % num_proteins])
+			for protein2 in hits:
+				length1 = len(sequences1[protein1])
+				length2 = len(sequences2[protein2])
+				values = [protein1, protein2,
+					'1e-%d' % generator.randint(6, 90), min(length1, length2),
+					generator.randint(1, 5),
+					length1 - generator.randint(0, 5),
+					generator.randint(1, 5),
+					length2 - generator.randint(0, 5),
+					generator.randint(50, 400), generator.randint(10, 100),
+					generator.randint(10, 100), generator.randint(0, 20),
+					generator.randint(0, 10)]
+				f.write(','.join(map(str, values)) + '\n')
+
+	# most interactions of Org-One also exist between the orthologs
+	edges = []
+	for k in range(4 * num_proteins):
+		edge = generator.choice(proteins1), generator.choice(proteins1)
+		if edge not in edges and edge[::-1] not in edges:
+			edges.append(edge)
+	write_interactome(path('Org-One-Interactome.tsv'), edges)
+	orthologs = dict(zip(proteins1, proteins2))
+	edges2 = [(orthologs[protein1], orthologs[protein2])
+		for protein1, protein2 in edges[:len(edges) / 2]]
+	edges2 += [(generator.choice(proteins2), generator.choice(proteins2))
+		for k in range(num_proteins / 2)]
+	write_interactome(path('Org-Two-Interactome.tsv'), edges2)
+
+	with open(path('Org-One-InterfacesALL.tsv'), 'w') as f:
+		f.write('P1\tP2\tSource\tP1_IRES\tP2_IRES\n')
+		for protein1, protein2 in edges[:len(edges) * 3 / 4]:
+			f.write('\t'.join([protein1, protein2,
+				generator.choice(['PDB', 'ECLAIR']),
+				zipped_indices(generator, len(sequences1[protein1])),
+				zipped_indices(generator, len(sequences1[protein2]))]) + '\n')
+
+	categories = ['Active site', 'Binding site', 'Metal binding']
+	sites = {}
+	for protein in proteins1:
+		if generator.random() < 0.7:
+			sites[protein] = [intervals(generator, len(sequences1[protein]))
+				for category in categories]
+	write_special_sites(path('Org-One-Special-Sites.npz'), categories, sites)
+
+	with open(path('Org-One-Pfam.tsv'), 'w') as f:
+		f.write('seq id\talignment start\talignment end\tenvelope start\t'
+			'envelope end\thmm acc\thmm name\ttype\thmm start\thmm end\t'
+			'hmm length\tbit score\tE-value\tclan\n')
+		for protein in proteins1:
+			length = len(sequences1[protein])
+			for k in range(generator.choice([0, 1, 1, 2, 3])):
+				start = generator.randint(1, length - 10)
+				end = generator.randint(start, length)
+				f.write('%s\t%d\t%d\t%d\t%d\tPF00001.1\tDom\tDomain\t1\t50\t'
+					'60\t30.5\t1e-5\tNo_clan\n' % (protein, start, end, start,
+					end))
+	return directory
+
+
+
+##################
+# Helper methods #
+##################
+
+# sequence with about 5% deleted, 5% substituted and 3% inserted residues
+def mutate(generator, sequence):
+	mutated = []
+	for residue in sequence:
+		x = generator.random()
+		if x < 0.05:
+			continue
+		if x < 0.1:
+			mutated.append(generator.choice(residues))
+		elif x < 0.13:
+			mutated.append(residue + generator.choice(residues))
+		else:
+			mutated.append(residue)
+	return ''.join(mutated)
+
+def write_fasta(file, proteins, sequences):
+	with open(file, 'w') as f:
+		for protein in proteins:
+			f.write('>%s\n%s\n' % (protein, sequences[protein]))
+
+def write_interactome(file, edges):
+	with open(file, 'w') as f:
+		f.write(interactome_header)
+		for protein1, protein2 in edges:
+			f.write('%s\t%s\tg\tg\n' % (protein1, protein2))
+
+# 1-based (starts, ends) of up to 5 intervals, some of a single residue
+def intervals(generator, length):
+	starts, ends = [], []
+	for k in range(generator.randint(0, 5)):
+		start = generator.randint(1, length - 1)
+		starts.append(start)
+		if generator.random() < 0.6:
+			ends.append(min(length, start + generator.randint(0, 12)))
+		else:
+			ends.append(start)
+	return sort_intervals(starts, ends)
+
+# interface residues like Interactome INSIDER, ex. '[3-9,15]'
+def zipped_indices(generator, length):
+	starts, ends = intervals(generator, length)
+	entries = [str(start) if start == end else '%d-%d' % (start, end)
+		for start, end in zip(starts.tolist(), ends.tolist())]
+	return '[' + ','.join(entries) + ']'
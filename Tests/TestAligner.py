@@ -0,0 +1,121 @@
+# Copyright © Garima Kapila
+
+import os, random, sys, unittest
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from DataCollector.Aligner import best_global_alignment
+from DataCollector.GlobalAlignment import global_alignment
+from DataCollector.ResidueSet import ResidueSet
+from DataCollector.SequenceParser import *
+
+
+"""
+Single-traceback global alignments (Aligner) against the best of every
+optimal alignment listed by Bio.pairwise2 (global_alignment mode 'all'):
+same score, length, identical residues and identical interface residues, in
+full, linear space and banded alignments (with a band that holds the best
+alignment)
+Alignments with the same score and counts can still differ
+"""
+
+residues = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+# identical residues and identical interface residues of an alignment
+def counts(alignment1, alignment2, residue_indices):
+	positions = shift_gap_indices(alignment1, residue_indices)
+	return num_identical(alignment1, alignment2), num_identical(
+		gather_characters(alignment1, positions),
+		gather_characters(alignment2, positions))
+
+
+class TestAligner(unittest.TestCase):
+
+	def setUp(self):
+		self.generator = random.Random(0)
+
+	# sequence and a mutated copy, with insertions, deletions and repeats
+	def related_pair(self, length):
+		sequence1 = ''.join(self.generator.choice(residues)
+			for k in range(length))
+		if self.generator.random() < 0.3:
+			sequence1 = sequence1[:4] * 2 + sequence1
+		sequence2 = []
+		for residue in sequence1:
+			x = self.generator.random()
+			if x < 0.08:
+				continue
+			if x < 0.2:
+				sequence2.append(self.generator.choice(residues))
+			elif x < 0.26:
+				sequence2.append(residue + self.generator.choice(residues))
+			else:
+				sequence2.append(residue)
+		return sequence1, ''.join(sequence2) or 'M'
+
+	def interface(self, sequence):
+		indices = ResidueSet()
+		for k in range(self.generator.randint(0, 3)):
+			start = self.generator.randint(0, len(sequence) - 1)
+			indices = indices | ResidueSet([start], [start +
+				self.generator.randint(1, 6)])
+		return indices
+
+	def assertSameAlignment(self, result, expected, seq1, seq2, indices):
+		alignment1, alignment2, score, length = result
+		self.assertEqual(alignment1.replace('-', ''), seq1)
+		self.assertEqual(alignment2.replace('-', ''), seq2)
+		self.assertEqual(score, expected[2])
+		self.assertEqual(length, expected[3])
+		self.assertEqual(counts(alignment1, alignment2, indices),
+			counts(expected[0], expected[1], indices))
+
+	def test_best_alignment(self):
+		for k in range(200):
+			seq1, seq2 = self.related_pair(self.generator.randint(1, 40))
+			indices = self.interface(seq1)
+			expected = global_alignment(seq1, seq2, indices, mode = 'all')
+			self.assertSameAlignment(global_alignment(seq1, seq2, indices),
+				expected, seq1, seq2, indices)
+
+	def test_linear_space(self):
+		for k in range(200):
+			seq1, seq2 = self.related_pair(self.generator.randint(1, 40))
+			indices = self.interface(seq1)
+			expected = global_alignment(seq1, seq2, indices, mode = 'all')
+			# split down to blocks of at most 64 cells
+			for max_bytes in [64, 1 << 20]:
+				result = best_global_alignment(seq1, seq2, indices,
+					max_cells = 0, max_bytes = max_bytes)
+				self.assertSameAlignment(result, expected, seq1, seq2,
+					indices)
+
+	# bands that hold the best alignment, narrower bands can lose score (see
+	# Benchmarks/BandedAlignment.py)
+	def test_banded(self):
+		for k in range(200):
+			seq1, seq2 = self.related_pair(self.generator.randint(1, 40))
+			indices = self.interface(seq1)
+			expected = global_alignment(seq1, seq2, indices, mode = 'all')
+			diagonals = alignment_diagonals(expected[0], expected[1])
+			for width in [0, 3]:
+				band = (min(diagonals) - width, max(diagonals) + width)
+				result = best_global_alignment(seq1, seq2, indices,
+					band = band)
+				self.assertSameAlignment(result, expected, seq1, seq2,
+					indices)
+
+
+# diagonals j - i of the cells an alignment passes through
+def alignment_diagonals(alignment1, alignment2):
+	i, j, diagonals = 0, 0, [0]
+	for residue1, residue2 in zip(alignment1, alignment2):
+		i += residue1 != '-'
+		j += residue2 != '-'
+		diagonals.append(j - i)
+	return diagonals
+
+if __name__ == "__main__":
+	unittest.main()
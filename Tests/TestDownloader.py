@@ -0,0 +1,172 @@
+# Copyright © Garima Kapila
+
+import BaseHTTPServer, gzip, json, os, shutil, SocketServer, StringIO, sys
+import tempfile, threading, unittest
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from DataCollector.Downloader import Downloader
+
+
+"""
+Downloader against a local stand-in HTTP server: plain and gzip encoded
+responses, resuming interrupted transfers with Range, starting over when
+the range is not satisfiable (416) and resuming through redirects
+"""
+
+contents = ''.join('%06d\n' % k for k in range(20000))
+etag = '"v1"'
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		server = self.server
+		server.requests.append((self.path, self.headers.get('Range')))
+		if self.path == '/redirect':
+			self.send_response(302)
+			self.send_header('Location', '/data')
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+			return
+
+		body = contents
+		if server.gzip and 'gzip' in self.headers.get('Accept-Encoding', ''):
+			buffer = StringIO.StringIO()
+			with gzip.GzipFile(fileobj = buffer, mode = 'wb') as f:
+				f.write(contents)
+			body = buffer.getvalue()
+
+		start = 0
+		ranges = self.headers.get('Range')
+		if ranges != None and self.headers.get('If-Range') == etag:
+			start = int(ranges.split('=')[1].rstrip('-'))
+			if start >= len(body):
+				self.send_response(416)
+				self.send_header('Content-Length', '0')
+				self.end_headers()
+				return
+			self.send_response(206)
+		else:
+			self.send_response(200)
+		self.send_header('ETag', etag)
+		self.send_header('Content-Length', str(len(body) - start))
+		if body != contents:
+			self.send_header('Content-Encoding', 'gzip')
+		self.end_headers()
+
+		# first response is cut off halfway, as if the connection dropped
+		if server.interrupt > 0:
+			server.interrupt -= 1
+			self.wfile.write(body[start:(start + len(body)) / 2])
+			self.wfile.flush()
+			self.close_connection = True
+			return
+		self.wfile.write(body[start:])
+
+	def log_message(self, *args):
+		pass
+
+
+# kept-alive connections are served at the same time
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	daemon_threads = True
+
+
+class TestDownloader(unittest.TestCase):
+
+	def setUp(self):
+		self.server = Server(('127.0.0.1', 0), Handler)
+		self.server.requests, self.server.gzip, self.server.interrupt = [],  \
+			False, 0
+		thread = threading.Thread(target = self.server.serve_forever)
+		thread.daemon = True
+		thread.start()
+		self.url = 'http://127.0.0.1:%d' % self.server.server_port
+		self.directory = tempfile.mkdtemp()
+		self.file = os.path.join(self.directory, 'data.txt')
+		self.downloader = Downloader(retries = 2, backoff = 0)
+		self.stdout, sys.stdout = sys.stdout, StringIO.StringIO()
+
+	def tearDown(self):
+		sys.stdout = self.stdout
+		# idle kept-alive connections, so the server threads serving them end
+		for connections in self.downloader.connections.values():
+			for connection in connections:
+				connection.close()
+		self.server.shutdown()
+		self.server.server_close()
+		shutil.rmtree(self.directory)
+
+	def read(self):
+		with open(self.file, 'rb') as f:
+			return f.read()
+
+	# partial file and its info as left by an interrupted download of url
+	def write_partial(self, url, size):
+		with open(self.file + '.part', 'wb') as f:
+			f.write(contents[:size])
+		with open(self.file + '.part.info', 'w') as f:
+			json.dump({'url': url, 'validator': etag}, f)
+
+	def test_download(self):
+		status, headers = self.downloader.download(self.url + '/data',
+			self.file)
+		self.assertEqual(status, 200)
+		self.assertEqual(self.read(), contents)
+		self.assertFalse(os.path.exists(self.file + '.part'))
+
+	def test_gzip(self):
+		self.server.gzip = True
+		self.downloader.download(self.url + '/data', self.file)
+		self.assertEqual(self.read(), contents)
+
+	def test_resume(self):
+		self.server.interrupt = 1
+		self.downloader.download(self.url + '/data', self.file)
+		self.assertEqual(self.read(), contents)
+		self.assertEqual(self.server.requests, [('/data', None),
+			('/data', 'bytes=%d-' % (len(contents) / 2))])
+
+	def test_resume_gzip(self):
+		self.server.gzip, self.server.interrupt = True, 1
+		self.downloader.download(self.url + '/data', self.file)
+		self.assertEqual(self.read(), contents)
+		self.assertNotEqual(self.server.requests[1][1], None)
+
+	def test_range_not_satisfiable(self):
+		# partial file longer than the file on the server
+		self.write_partial(self.url + '/data', len(contents))
+		with open(self.file + '.part', 'ab') as f:
+			f.write('stale')
+		self.downloader.download(self.url + '/data', self.file)
+		self.assertEqual(self.read(), contents)
+		self.assertEqual(self.server.requests, [
+			('/data', 'bytes=%d-' % (len(contents) + 5)), ('/data', None)])
+
+	def test_redirect_with_partial_file(self):
+		self.write_partial(self.url + '/redirect', 1000)
+		self.downloader.download(self.url + '/redirect', self.file)
+		self.assertEqual(self.read(), contents)
+		self.assertEqual(self.server.requests[-1], ('/data', 'bytes=1000-'))
+
+	def test_redirect_with_partial_file_of_other_url(self):
+		self.write_partial(self.url + '/other', 1000)
+		self.downloader.download(self.url + '/redirect', self.file)
+		self.assertEqual(self.read(), contents)
+		self.assertEqual(self.server.requests,
+			[('/redirect', None), ('/data', None)])
+
+	def test_resume_after_redirect(self):
+		self.server.interrupt = 1
+		self.downloader.download(self.url + '/redirect', self.file)
+		self.assertEqual(self.read(), contents)
+		self.assertEqual(self.server.requests[-1],
+			('/data', 'bytes=%d-' % (len(contents) / 2)))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,66 @@
+# Copyright © Garima Kapila
+
+import os, shutil, sys, tempfile, unittest
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from DataCollector.FastaStore import FastaStore
+
+
+"""
+FastaStore reads the same sequences as parsing the fasta file, and rebuilds
+its index when the fasta file is rewritten even within the same second
+"""
+
+sequences = [
+	('P1', 'MKTAYIAKQRQISFVKSHFSRQ' * 5),
+	('P2', ''),
+	('P3', 'ACDEFGHIKLMNPQRSTVWY'),
+	('P4', 'M')
+]
+
+
+class TestFastaStore(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.file = os.path.join(self.directory, 'Organism.fasta')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def write_fasta(self, sequences, line_width):
+		with open(self.file, 'w') as f:
+			for protein, sequence in sequences:
+				f.write('>' + protein + '\n')
+				for start in range(0, len(sequence), line_width):
+					f.write(sequence[start:start + line_width] + '\n')
+
+	def assertSequences(self, fasta, sequences):
+		self.assertEqual(list(fasta), [protein for protein, s in sequences])
+		for protein, sequence in sequences:
+			self.assertEqual(fasta[protein], sequence)
+			self.assertEqual(fasta.length(protein), len(sequence))
+
+	def test_sequences(self):
+		for line_width in [1, 7, 60, 1000]:
+			self.write_fasta(sequences, line_width)
+			self.assertSequences(FastaStore(self.file), sequences)
+			# again from the saved index
+			self.assertSequences(FastaStore(self.file), sequences)
+
+	def test_rewritten_in_same_second(self):
+		self.write_fasta(sequences, 60)
+		FastaStore(self.file)
+		mtime = os.path.getmtime(self.file)
+
+		# same modification time, as on file systems with coarse timestamps
+		rewritten = [('P3', 'ACDEFGHIKLMNPQRSTVWY'), ('P1', 'MKV' * 10)]
+		self.write_fasta(rewritten, 60)
+		os.utime(self.file, (mtime, mtime))
+		self.assertSequences(FastaStore(self.file), rewritten)
+
+
+if __name__ == "__main__":
+	unittest.main()
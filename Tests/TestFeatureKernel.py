@@ -0,0 +1,94 @@
+# Copyright © Garima Kapila
+
+import os, random, sys, unittest
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from DataCollector.FeatureKernel import FeatureKernel
+from DataCollector.Interologs import default_interface_compare_categories
+from DataCollector.Orthologs import *
+
+
+"""
+FeatureKernel against get_differences as it was before the lookup table,
+which called every category function for every pair of residues
+"""
+
+# get_differences as it was, values added one pair of residues at a time
+def get_differences(sequence1, sequence2, functions):
+	length = len([value for function in functions
+		for value in function('A', 'A')])
+	results = [0] * length
+	for residue_pair in zip(sequence1, sequence2):
+		comparisons = [value for function in functions
+			for value in function(*residue_pair)]
+		results = [v1 + v2 for v1, v2 in zip(results, comparisons)]
+	return results
+
+categories = [
+	default_global_compare_categories(),
+	default_domain_compare_categories(),
+	default_special_sites_compare_categories(),
+	default_interface_compare_categories()
+]
+
+residues = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+class TestFeatureKernel(unittest.TestCase):
+
+	def setUp(self):
+		self.generator = random.Random(0)
+
+	# aligned pair of sequences, without gaps facing each other
+	def aligned_pair(self, length):
+		sequence1, sequence2 = [], []
+		for k in range(length):
+			x = self.generator.random()
+			sequence1.append('-' if x < 0.1 else
+				self.generator.choice(residues))
+			sequence2.append('-' if 0.1 <= x < 0.2 else
+				self.generator.choice(residues))
+		return ''.join(sequence1), ''.join(sequence2)
+
+	def test_differences(self):
+		for names, functions in categories:
+			kernel = FeatureKernel(functions)
+			for length in [0, 1, 2, 17, 300] * 20:
+				sequence1, sequence2 = self.aligned_pair(length)
+				self.assertEqual(kernel.differences(sequence1, sequence2),
+					get_differences(sequence1, sequence2, functions))
+
+	def test_batch_differences(self):
+		for names, functions in categories:
+			kernel = FeatureKernel(functions)
+			pairs = [self.aligned_pair(self.generator.choice([0, 1, 5, 60,
+				400])) for k in range(300)]
+			expected = [get_differences(sequence1, sequence2, functions)
+				for sequence1, sequence2 in pairs]
+			self.assertEqual(kernel.batch_differences(pairs), expected)
+			# batches of one alignment, and many short with one long
+			self.assertEqual(kernel.batch_differences(pairs, max_cells = 1),
+				expected)
+			pairs = [('A', 'C')] * 500 + [self.aligned_pair(3000)]
+			self.assertEqual(kernel.batch_differences(pairs,
+				max_cells = 1 << 12), [get_differences(sequence1, sequence2,
+				functions) for sequence1, sequence2 in pairs])
+
+	# residues outside the table are compared by the category functions
+	def test_other_characters(self):
+		for names, functions in categories:
+			kernel = FeatureKernel(functions)
+			for pair in [('AXC', 'AAC'), ('A-C', 'A-C'), ('ABC', 'AZC')]:
+				try:
+					expected = get_differences(pair[0], pair[1], functions)
+				except Exception as error:
+					self.assertRaises(type(error), kernel.differences, *pair)
+					continue
+				self.assertEqual(kernel.differences(*pair), expected)
+				self.assertEqual(kernel.batch_differences([pair]), [expected])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,121 @@
+# Copyright © Garima Kapila
+
+import filecmp, os, shutil, StringIO, sys, tempfile, unittest
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from Tests.Fixtures import write_transfer
+import DataCollector.Interologs as Interologs
+from DataCollector.GlobalAlignment import get_global_alignments
+from DataCollector.Orthologs import get_orthologs, label_orthologs
+from DataCollector.DataParser import *
+
+
+"""
+Interologs of a synthetic transfer (Fixtures) written in chunks are the same
+as written at once, and the same as label_interologs before the join on
+interactome edges, which compared every pair of orthologs in memory
+"""
+
+fasta_file1, fasta_file2 = 'Org-One.fasta', 'Org-Two.fasta'
+interactome_file1 = 'Org-One-Interactome.tsv'
+interactome_file2 = 'Org-Two-Interactome.tsv'
+interfaces_file1 = 'Org-One-InterfacesALL.tsv'
+special_sites_file = 'Org-One-Special-Sites.npz'
+pfam_file = 'Org-One-Pfam.tsv'
+
+
+# label_interologs as it was, every pair of orthologs i > j in memory
+def label_interologs(orthologs_file, interactome_fileA, interactome_fileB,
+	file_name):
+	orthologs = pd.read_csv(orthologs_file, sep = ',')
+	interactomeA = interactome_as_dict(interactome_fileA)
+	interactomeB = interactome_as_dict(interactome_fileB)
+
+	columns = list(orthologs.columns)
+	columns.remove('A'), columns.remove('B')
+	columns = ['A1', 'B1', 'A2', 'B2'] + double_columns(columns) + ['Label']
+	values = orthologs.drop(columns = ['A', 'B'], axis = 1)
+	orthologs = zip(orthologs.A, orthologs.B, values.values)
+
+	interologs = []
+	for i, (a1, b1, values1) in enumerate(orthologs):
+		for j, (a2, b2, values2) in enumerate(orthologs):
+			if i > j and (a1, a2) in interactomeA:
+				interologs.append([a1, b1, a2, b2] + values1.tolist() +
+					values2.tolist() + [int((b1, b2) in interactomeB)])
+	pd.DataFrame(interologs, columns = columns).to_csv(file_name, sep = ',',
+		index = False)
+	return file_name
+
+
+class TestInterologs(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.stdout, sys.stdout = sys.stdout, StringIO.StringIO()
+		cls.working_directory = os.getcwd()
+		cls.directory = tempfile.mkdtemp()
+		write_transfer(cls.directory)
+		os.chdir(cls.directory)
+		cls.orthologs = get_orthologs('BlastP_Org-One_Org-Two.csv',
+			fasta_file1, fasta_file2)
+		cls.global_alignments = get_global_alignments(cls.orthologs,
+			fasta_file1, fasta_file2, interfaces_file1)
+		label_orthologs(cls.orthologs, cls.global_alignments,
+			special_sites_file, pfam_file)
+		cls.interologs = Interologs.label_interologs(cls.orthologs,
+			interactome_file1, interactome_file2, 'Interologs.csv')
+		sys.stdout = cls.stdout
+
+	@classmethod
+	def tearDownClass(cls):
+		os.chdir(cls.working_directory)
+		shutil.rmtree(cls.directory)
+
+	def setUp(self):
+		self.chunk_size = Interologs.chunk_size
+		self.stdout, sys.stdout = sys.stdout, StringIO.StringIO()
+
+	def tearDown(self):
+		Interologs.chunk_size = self.chunk_size
+		sys.stdout = self.stdout
+
+	def assertSameFile(self, file1, file2):
+		self.assertTrue(filecmp.cmp(file1, file2, shallow = False),
+			'%s differs from %s' % (file1, file2))
+
+	def test_interologs(self):
+		self.assertGreater(count_rows(self.interologs), 50)
+		expected = label_interologs(self.orthologs, interactome_file1,
+			interactome_file2, 'Expected_Interologs.csv')
+		self.assertSameFile(self.interologs, expected)
+
+	def test_label_interologs_chunks(self):
+		for size in [1, 3, 7]:
+			Interologs.chunk_size = size
+			file_name = Interologs.label_interologs(self.orthologs,
+				interactome_file1, interactome_file2, 'Chunks_%d.csv'
+				% size)
+			self.assertSameFile(file_name, self.interologs)
+
+	# chunks of interologs, and rows split across processes
+	def test_add_interface_information(self):
+		outputs = []
+		for size, jobs in [(50000, 1), (7, 1), (50000, 3), (3, 2)]:
+			Interologs.chunk_size = size
+			# interologs file is filtered in place
+			name = '%d_%d.csv' % (size, jobs)
+			shutil.copyfile(self.interologs, 'Interologs_' + name)
+			outputs.append(Interologs.add_interface_information(
+				'Interologs_' + name, interfaces_file1,
+				self.global_alignments, special_sites_file, pfam_file,
+				fasta_file1, 'Interface_' + name, jobs))
+		self.assertGreater(count_rows(outputs[0]), 0)
+		for out_file in outputs[1:]:
+			self.assertSameFile(out_file, outputs[0])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,89 @@
+# Copyright © Garima Kapila
+
+import os, random, sys, unittest
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository)
+
+from DataCollector.ResidueSet import ResidueSet
+
+
+"""
+ResidueSet against the lists of indices DataParser built before it,
+parse_zipped_indices and the set operations on its lists are kept here as
+the reference
+"""
+
+# parse_zipped_indices as it was, list of decremented indices
+def parse_zipped_indices(zipped_indices):
+	indices_string = zipped_indices.strip('[]').replace(' ', '')
+	indices = []
+	for entry in indices_string.split(','):
+		try:
+			start, end = entry.split('-')
+			indices += range(int(start), int(end) + 1)
+		except ValueError:
+			if entry != '':
+				indices.append(int(entry))
+	return [i - 1 for i in sorted(set(indices))]
+
+# random Interactome INSIDER string, ex. '[1 ,2,8,7,3 ,4, 5-8, 15-17]'
+def zipped_indices(generator, length):
+	entries = []
+	for k in range(generator.randint(0, 8)):
+		start = generator.randint(1, length)
+		if generator.random() < 0.5:
+			# ranges can overlap, touch or be written backwards
+			end = max(1, start + generator.randint(-2, 15))
+			entry = '%d-%d' % (start, end)
+		else:
+			entry = str(start)
+		entries.append(entry + ' ' * generator.randint(0, 1))
+	return '[' + ','.join(entries) + ']'
+
+
+class TestResidueSet(unittest.TestCase):
+
+	def setUp(self):
+		self.generator = random.Random(0)
+
+	def test_parse(self):
+		for k in range(2000):
+			zipped = zipped_indices(self.generator, 60)
+			indices = ResidueSet.parse(zipped)
+			expected = parse_zipped_indices(zipped)
+			self.assertEqual(list(indices), expected, zipped)
+			self.assertEqual(indices.indices().tolist(), expected)
+			self.assertEqual(len(indices), len(expected))
+
+	def test_examples(self):
+		self.assertEqual(list(ResidueSet.parse('[1 ,2,8,7,3 ,4, 5-8]')),
+			range(8))
+		self.assertEqual(list(ResidueSet.parse('[]')), [])
+		interface = ResidueSet.parse('[1-5,8]')
+		domain = ResidueSet.from_intervals([3], [9])
+		self.assertEqual(interface.intersection_count(domain), 4)
+
+	def test_set_operations(self):
+		for k in range(1000):
+			zipped1 = zipped_indices(self.generator, 40)
+			zipped2 = zipped_indices(self.generator, 40)
+			indices1, indices2 = ResidueSet.parse(zipped1),                   \
+				ResidueSet.parse(zipped2)
+			list1, list2 = parse_zipped_indices(zipped1),                     \
+				parse_zipped_indices(zipped2)
+			self.assertEqual(list(indices1 | indices2),
+				sorted(set(list1) | set(list2)))
+			self.assertEqual(indices1.intersection_count(indices2),
+				len(set(list1).intersection(list2)))
+			for index in range(-1, 60):
+				self.assertEqual(index in indices1, index in list1)
+
+	def test_zipped(self):
+		for k in range(500):
+			indices = ResidueSet.parse(zipped_indices(self.generator, 60))
+			self.assertEqual(ResidueSet.parse(indices.zipped()), indices)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,24 +1,68 @@
 # Copyright © Garima Kapila
 
-from Collector import *
-from Results import *
-import bs4, lxml.html as html, re, urllib2
+from Catalog import Catalog
+from DataCollector.DownloadCache import DownloadCache
+from DataCollector.Downloader import Downloader
+import os, sys
+
+
+# options given as --name without a value
+flag_options = ['offline', 'align-all']
+
+# stages to run for each transfer, chosen with --stage
+stages = {
+	'all': ['collect', 'results'],
+	'collect': ['collect'],
+	'results': ['results']
+}
 
 
 def main():
 	
-	# Fetch organism transfer options
-	interface_options, epithets = get_INSIDER_options()
-	organisms = get_HINT_options(epithets)
-	organisms = {organism.acronym: organism for organism in organisms}
+	# separate options (ex. --offline, --cache-dir Cache) from arguments
+	args, options = split_options(sys.argv[1:])
+
+	# collect = only data collection, results = only clustering/classifying
+	stage = options.get('stage', 'all').lower()
+	if stage not in stages:
+		print 'Invalid --stage %s, options: %s' % (stage,
+			', '.join(sorted(stages)))
+		return
+	run_stages = stages[stage]
+
+	# downloads are shared across all transfers
+	cache = get_download_cache(options)
+
+	# Load organism transfer options
+	catalog = get_catalog(args, options, cache)
+	if args[:1] == ['refresh']:
+		return
+	interface_options = catalog.interface_options()
+	organisms = catalog.organisms()
+
+	# alignments are only needed when collecting data
+	alignment_cache = None
+	if 'collect' in run_stages:
+		alignment_cache = get_alignment_cache(options, cache)
+
+	jobs = int(options.get('jobs', 1))
+	alignment = options.get('alignment', 'best').lower()
+	band_width = int(options.get('band-width', 32))
+	align_all = options.get('align-all', False)
+	blast_workers = int(options.get('blast-workers', 1))
+	blast_threads = int(options.get('blast-threads', 1))
 	
 	# Do interologs annotation transfer
-	inputs = parse_arguments(interface_options, organisms)
+	inputs = parse_arguments(args, interface_options, organisms)
 	if inputs != None:
 		for input_args in inputs:
 			organism1, organism2, option, update = input_args
-			collect_data(organism1, organism2, option, update)
-			get_results(organism1, organism2, option)
+			if 'collect' in run_stages:
+				collect_data(organism1, organism2, option, update, cache,
+					jobs, alignment, band_width, alignment_cache, align_all,
+					blast_workers, blast_threads)
+			if 'results' in run_stages:
+				get_results(organism1, organism2, option)
 			print '\n\n\n'
 
 
@@ -29,11 +73,10 @@ def main():
 
 
 # return organism1, organism2, and interface option
-def parse_arguments(interface_options, organisms):
+def parse_arguments(args, interface_options, organisms):
 	# get list of organisms to transfer annotations
 	update = False
-	args = sys.argv[1:]
-	if sys.argv[-1].upper() == 'UPDATE':
+	if len(args) > 0 and args[-1].upper() == 'UPDATE':
 		update = True
 		args = args[:-1]
 	organisms_list, option = args_to_organisms(args, organisms)
@@ -51,14 +94,25 @@ def parse_arguments(interface_options, organisms):
 
 # collect data online, label interologs + interface information
 # update means sequence alignment steps can be skipped
-def collect_data(organism1, organism2, option, update):
+# jobs = number of processes for global alignments and interface information
+# alignment = 'best', 'banded' (around BLAST HSP) or 'all' global alignments
+# align_all = align orthologs that cannot form interologs with interfaces too
+# blast_workers = blastp processes on shards of proteins, each with
+# blast_threads threads
+def collect_data(organism1, organism2, option, update, cache=None, jobs=1,
+	alignment='best', band_width=32, alignment_cache=None, align_all=False,
+	blast_workers=1, blast_threads=1):
+	from Collector import Collector
 	print 'Transferring protein interaction annotations, %s interfaces:\n> '  \
 		'%s to %s' % (option.upper(), organism1.info, organism2.info)
-	collector = Collector(organism1, organism2, option)
+	collector = Collector(organism1, organism2, option, cache, jobs,
+		alignment, band_width, alignment_cache, align_all, blast_workers,
+		blast_threads)
 	return collector.run(update = update)
 
-# cluster/classify
+# cluster/classify, machine learning libraries are only imported here
 def get_results(organism1, organism2, option):
+	from Results import Results
 	print 'Analyzing Features'
 	results = Results(organism1, organism2, option)
 	results.run()
@@ -68,6 +122,69 @@ def get_results(organism1, organism2, option):
 ### Helper Methods for parse_arguments ###
 
 
+"""
+separate '--name value', '--name=value' and '--flag' options from arguments
+ex. split_options(['HS', 'ALL', '--offline', '--cache-dir', 'Cache'])
+returns ['HS', 'ALL'], {'offline': True, 'cache-dir': 'Cache'}
+"""
+def split_options(args):
+	arguments, options = [], {}
+	i = 0
+	while i < len(args):
+		if args[i].startswith('--'):
+			name, equals, value = args[i][2:].partition('=')
+			if name in flag_options:
+				options[name] = True
+			elif equals == '' and i + 1 < len(args):
+				i += 1
+				options[name] = args[i]
+			else:
+				options[name] = value
+		else:
+			arguments.append(args[i])
+		i += 1
+	return arguments, options
+
+
+"""
+load organism and interface options from catalog snapshot, 'refresh' as the
+first argument scrapes the databases again, a snapshot older than
+--catalog-age days (default 30) is refreshed in the background
+"""
+def get_catalog(args, options, cache):
+	catalog = Catalog(options.get('catalog', 'catalog.json'))
+	max_age = float(options.get('catalog-age', 30)) * 24 * 3600
+	if args[:1] == ['refresh'] or not catalog.exists():
+		sys.stdout.write('\rRefreshing %s' % catalog.file); sys.stdout.flush()
+		catalog.refresh(cache)
+		num_organisms = len(catalog.organisms())
+		message = 'Refreshed %s: %d organisms' % (catalog.file, num_organisms)
+		sys.stdout.write('\r' + message + '\n'); sys.stdout.flush()
+	elif catalog.is_stale(max_age) and not cache.offline:
+		catalog.refresh_in_background(cache)
+	return catalog
+
+
+"""
+download cache from options, defaults are directory 'Cache', 168 hours
+before revalidating a file, 5000 MB total size and 5 parallel downloads
+"""
+def get_download_cache(options):
+	directory = options.get('cache-dir', 'Cache')
+	ttl = float(options.get('cache-ttl', 168)) * 3600
+	max_size = int(float(options.get('cache-size', 5000)) * 1024**2)
+	offline = options.get('offline', False)
+	downloader = Downloader(workers = int(options.get('download-workers', 5)))
+	return DownloadCache(directory, ttl, max_size, offline, downloader)
+
+# global alignment cache in download cache directory, default 2000 MB
+def get_alignment_cache(options, cache):
+	from DataCollector.AlignmentCache import AlignmentCache
+	max_size = int(float(options.get('alignment-cache-size', 2000)) * 1024**2)
+	file = os.path.join(cache.directory, 'alignments.sqlite')
+	return AlignmentCache(file, max_size)
+
+
 # convert arguments to valid organisms
 def get_valid_args(interface_options, organisms):
 	message = 'Enter two species to transfer interactions from, or one'       \
@@ -75,7 +192,7 @@ def get_valid_args(interface_options, organisms):
 	'"arguments.txt" as input\narguments and an option for interfaces, '      \
 	'examples:'                                                               \
 	'\n> HS SC ALL\n> HS HQ\n> arguments.txt ALL\n\nOrganism options: \n'
-	interface_options = '\n\t'.join(interface_options.keys())
+	interface_options = '\n\t'.join(interface_options)
 	message += '\n'.join(['\t' + organism.acronym + '\t' + organism.info      \
 		for organism in organisms.values()]) + '\nInterface options: \n' +    \
 		'\t' + interface_options
@@ -131,52 +248,5 @@ def args_to_organisms(args, org_dict):
 	return organisms, option
 
 
-
-### Get transfer options ###
-
-
-# get organisms and interface options from INSIDER database
-def get_INSIDER_options():
-	url = 'http://interactomeinsider.yulab.org/downloads.html'
-	soup = str(bs4.BeautifulSoup(urllib2.urlopen(url), 'html.parser'))
-	tree = html.fromstring(soup)
-	# gather organism names from download links
-	hrefs = tree.xpath('//td//a/@href')
-	interface_options = {}
-	epithets = {}
-	for href in hrefs:
-		file_name = href.split('/')[-1].replace('.txt', '').split('_')
-		epithet = file_name[1]
-		interface_option = ''.join([c for c in file_name[-1] if c.isupper()])
-		epithets[epithet] = 1
-		interface_options[interface_option] = 1
-	return interface_options, epithets
-
-
-# get organisms from HINT database
-def get_HINT_options(epithets):
-	url = 'http://hint.yulab.org/download/'
-	soup = str(bs4.BeautifulSoup(urllib2.urlopen(url), 'html.parser'))
-	tree = html.fromstring(soup)
-	# gather organism names from download links
-	hrefs = tree.xpath('//div[@class="am-u-sm-6"]//a//@href')
-	hrefs = [href for href in hrefs if 'binary/hq' in href]
-	# filter organisms that have predicted interface residues from INSIDER
-	hrefs = [href for href in hrefs                                           \
-		if any(word.lower() in href.lower() for word in epithets.keys())]
-	# convert to Organism objects
-	hrefs = [href.replace('/download/', '') for href in hrefs]
-	hrefs = [href.replace('binary/hq', '') for href in hrefs]
-	names = [href.replace('/', '') for href in hrefs]
-	names = [tuple(re.findall('[A-Z][^A-Z]*', name)) for name in names]
-	genus = [name[0] for name in names]
-	names = [[name[1], ''.join(name[2:])] for name in names]
-	epithet = [re.sub(r'[0-9]+', '', name[0]) for name in names]
-	strain = [''.join([re.sub(r'[A-Z][a-z]+', '', name[0]), name[1]])
-		for name in names]
-	organisms = [Organism(g, e, s) for g, e, s in zip(genus, epithet, strain)]
-	return organisms
-
-
 if __name__ == "__main__":
 	main()
\ No newline at end of file